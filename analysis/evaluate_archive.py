@@ -11,6 +11,7 @@ import pickle as pkl
 from progress.bar import Bar
 import argparse
 import gc
+import hashlib
 from core.behavior_descriptors.behavior_descriptors import BehaviorDescriptor
 from analysis.gt_bd import *
 
@@ -57,19 +58,43 @@ class EvalArchive(object):
     :return:
     """
     global evaluator
-    _, data_traj = evaluator.evaluate({'genome':genome})
-    obs_traj = self.traj_to_obs(data_traj)
-    infos = []
-    for idx, t in enumerate(data_traj):
-      infos.append(t[3])
+    _, observations, _, _, infos = evaluator.record({'genome':genome})
+    obs_traj = self.traj_to_obs(observations)
 
     return (obs_traj, infos)
 
-  def load_eval_archive(self, generation=None):
+  def _eval_genomes(self, genomes):
+    """
+    This function evaluates the genomes, in parallel if the pool is used
+    :param genomes:
+    :return: list of (obs_traj, infos), one for each genome
+    """
+    global main_pool
+    if self.mp:
+      return main_pool.map(self._get_eval_traj, genomes)
+    trajs = []
+    for genome in genomes:
+      _, observations, _, _, infos = self.evaluator.record({'genome': genome})  # , action_coupled=self.action_coupled)
+      trajs.append((self.traj_to_obs(observations), infos))
+    return trajs
+
+  @staticmethod
+  def genome_key(genome):
+    """
+    Returns the key identifying the genome. It is the hash of the genome, so that agents with the same genome are
+    identified even if they have a different id (e.g. after a restart)
+    :param genome:
+    :return:
+    """
+    return hashlib.sha1(np.ascontiguousarray(genome, dtype=np.float64).tobytes()).hexdigest()
+
+  def load_eval_archive(self, generation=None, delta=True):
     """
     This function loads and evaluates the archives in the exp folder
     :param generation: Generation to evaluate. If None, evaluates the archive for all the generations
-    :return: Trajectory of observations
+    :param delta: If True, each agent is evaluated only once, even if it is in the archive of many generations.
+    The trajectories of the generations in which the agent is present all refer to the same evaluation.
+    :return: Trajectory of observations and sparse list of (step, info) of the non empty infos, for each generation
     """
     genomes = utils.load_arch_data(self.exp_path, info=['genome'], generation=generation, params=self.params)
     if self.agents is not None:
@@ -80,32 +105,34 @@ class EvalArchive(object):
 
     gen_obs_traj = {}
     gen_info_traj = {}
-    if generation is None:
-      bar = Bar('Generations:', max=len(genomes), suffix='[%(index)d/%(max)d] - Avg time per epoch: %(avg).3fs - Elapsed: %(elapsed_td)s')
-    else:
-      bar = None
-
-    global main_pool
     print("Starting evaluation...")
 
-    for gen in genomes:
-      if bar is not None:
-        bar.next()
-      if self.mp:
-        trajs = main_pool.map(self._get_eval_traj, genomes[gen]['genome'])
-        obs_trajs = [t[0] for t in trajs]
-        info_trajs = [t[1] for t in trajs]
+    if delta:
+      # The archive of a generation contains the one of the previous generation, so most agents are shared
+      gen_keys = {gen: [self.genome_key(genome) for genome in genomes[gen]['genome']] for gen in genomes}
+      unique_genomes = {}
+      for gen in genomes:
+        for key, genome in zip(gen_keys[gen], genomes[gen]['genome']):
+          if key not in unique_genomes:
+            unique_genomes[key] = genome
+      print("Evaluating {} different agents out of {}".format(len(unique_genomes), sum(len(gen_keys[gen]) for gen in gen_keys)))
+      trajs = dict(zip(unique_genomes.keys(), self._eval_genomes(list(unique_genomes.values()))))
+
+      for gen in genomes:
+        gen_obs_traj[gen] = [trajs[key][0] for key in gen_keys[gen]]
+        gen_info_traj[gen] = [trajs[key][1] for key in gen_keys[gen]]
+    else:
+      if generation is None:
+        bar = Bar('Generations:', max=len(genomes), suffix='[%(index)d/%(max)d] - Avg time per epoch: %(avg).3fs - Elapsed: %(elapsed_td)s')
       else:
-        obs_trajs = []
-        info_trajs = []
-        for genome in genomes[gen]['genome']:
-          _, data_traj = self.evaluator.evaluate({'genome': genome})  # , action_coupled=self.action_coupled)
-
-          obs_trajs.append(self.traj_to_obs(data_traj))
-          info_trajs.append([t[3] for t in data_traj])
-
-      gen_obs_traj[gen] = obs_trajs
-      gen_info_traj[gen] = info_trajs
+        bar = None
+
+      for gen in genomes:
+        if bar is not None:
+          bar.next()
+        trajs = self._eval_genomes(genomes[gen]['genome'])
+        gen_obs_traj[gen] = [t[0] for t in trajs]
+        gen_info_traj[gen] = [t[1] for t in trajs]
     print("Done")
     return gen_obs_traj, gen_info_traj
 
@@ -175,6 +202,7 @@ if __name__ == "__main__":
   parser.add_argument('-g', '--generation', help='Generation for which to evaluate the archive', type=int, default=None)
   parser.add_argument('-a', '--agents', help='Agents to evaluate', type=int, default=None)
   parser.add_argument('--multi', help='Flag to give in case multiple runs have to be evaluated', action='store_true')
+  parser.add_argument('--no_delta', help='Evaluate the agents again for each generation in which they are in the archive', action='store_true')
 
   args = parser.parse_args(["-p", "/home/giuseppe/src/cmans/experiment_data/Walker2D/Walker2D_NS/", '-g' '500', '-mp', '--multi'])
 
@@ -189,7 +217,7 @@ if __name__ == "__main__":
     print('Working on: {}'.format(path))
     arch_eval = EvalArchive(path, multip=args.multiprocessing, agents=args.agents)
 
-    obs_traj, infos_traj = arch_eval.load_eval_archive(args.generation)
+    obs_traj, infos_traj = arch_eval.load_eval_archive(args.generation, delta=not args.no_delta)
     gc.collect()
     arch_eval.save_trajectories(obs_traj, data_type='obs', generation=args.generation)
     arch_eval.save_trajectories(infos_traj, data_type='info', generation=args.generation)
@@ -5,6 +5,8 @@ import numpy as np
 import os
 from scipy.spatial.distance import jensenshannon
 from core.population import Archive
+from core.population.archive_log import ArchiveLog
+from core.population.snapshot import load_snapshot
 import pickle as pkl
 from environments.environments import registered_envs
 import re
@@ -57,25 +59,62 @@ def get_runs_list(path):
   runs = [run for run in os.listdir(path) if r.match(run)]
   return runs
 
-def load_arch_data(folder, info=None, generation=None, params=None):
+def load_arch_data(folder, info=None, generation=None, params=None, mmap=True):
   """
   This function loads all the archives, by generation in an experiment folder.
+  When only some infos are asked, only those are read from archive logs and npz snapshots.
   :param folder: The folder of the experiment
   :param info: List of information to load from the archive. If None the whole archive is loaded
   :param generation: generation for which to load the archive. If None, load all the archives
+  :param mmap: If True, the infos are memory mapped when possible, so only the accessed rows are read from disk
   """
+  if ArchiveLog.exists(os.path.join(folder, 'archive_log')):
+    return load_arch_log(os.path.join(folder, 'archive_log'), info=info, generation=generation, params=params, mmap=mmap)
+
   archives = {}
-  r = re.compile('archive_gen_.*.pkl')
+  r = re.compile('archive_gen_.*.(pkl|npz)')
   files = [file for file in os.listdir(folder) if 'archive' in file and r.match(file) is not None]
   for arch_file in files:
-    arch = Archive(params)
     gen = int(arch_file.split('_')[-1].split('.')[0])
     if gen == generation or generation is None:
+      if info is not None and arch_file.endswith('.npz'):
+        archives[gen] = load_snapshot(os.path.join(folder, arch_file), keys=info, mmap=mmap) # Read only the needed info
+        continue
+      arch = Archive(params)
       arch.load(os.path.join(folder, arch_file))
       if info is None:
         archives[gen] = arch # Load whole archive
       else:
         archives[gen] = {}
         for label in info: # Save only the needed info
-          archives[gen][label] = arch[label] # Each info is saved as a list of values
-  return archives
\ No newline at end of file
+          archives[gen][label] = arch[label] # Each info is saved as an array with a row per agent
+  return archives
+
+def load_arch_log(folder, info=None, generation=None, params=None, mmap=True):
+  """
+  This function loads the archives, by generation, from an archive log.
+  Given that the archive of each generation is made by the first agents of the log, the index and the log are read
+  only once and the infos of each generation are views of it.
+  :param folder: The folder of the archive log
+  :param info: List of information to load from the archive. If None the whole archive is loaded
+  :param generation: generation for which to load the archive. If None, load all the archives
+  :param mmap: If True, the infos are memory mapped, so only the accessed rows are read from disk
+  """
+  log = ArchiveLog(folder, params.archive_stored_info)
+  sizes = {entry['generation']: entry['size'] for entry in log.index()}
+  if generation is not None:
+    sizes = {gen: sizes[gen] for gen in sizes if gen == generation}
+  if len(sizes) == 0:
+    return {}
+
+  archives = {}
+  if info is None:
+    data = log.read_rows(max(sizes.values()), mmap=mmap) # Whole archive. Each generation copies its part in an Archive
+    for gen in sizes:
+      archives[gen] = Archive(params)
+      archives[gen].set_data({label: data[label][:sizes[gen]] for label in data})
+  else:
+    data = log.read_rows(max(sizes.values()), infos=info, mmap=mmap)
+    for gen in sizes:
+      archives[gen] = {label: data[label][:sizes[gen]] for label in info}
+  return archives
@@ -1,4 +1,4 @@
 # Created by Giuseppe Paolo 
 # Date: 28/07/2020
 
-from core.evaluator import Evaluator
\ No newline at end of file
+from core.evaluator import Evaluator, BatchEvaluator
\ No newline at end of file
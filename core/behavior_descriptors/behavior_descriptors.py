@@ -1,9 +1,132 @@
 # Created by Giuseppe Paolo 
 # Date: 28/07/2020
 
+import gym
 import numpy as np
 from environments.environments import registered_envs
 
+# ---------------------------------------------------------
+# BD streams. They are fed the steps of a batch of rollouts while they happen, through:
+#   init(observations): with the initial observations of the batch
+#   step(observations, rewards, dones, infos, active): after each step. Only the rollouts in the active mask did step.
+#     The infos are a list with a dict per rollout, and are given only if the stream needs_infos. Otherwise are None.
+#   finalize(): at the end of the rollouts. Returns the result for each rollout
+# This way only what is needed to extract the descriptor is kept in memory.
+# ---------------------------------------------------------
+class TrajectoryRecorder(object):
+  """
+  This class records the full trajectories of the rollouts, as lists of (obs, reward, done, info)
+  """
+  needs_infos = True
+
+  def __init__(self, batch_size):
+    self.batch_size = batch_size
+    self.trajs = None
+
+  def init(self, observations):
+    self.trajs = [[(observations[i], 0, False, {})] for i in range(self.batch_size)]
+
+  def step(self, observations, rewards, dones, infos, active):
+    for i in np.flatnonzero(active):
+      self.trajs[i].append((observations[i], rewards[i], dones[i], infos[i]))
+
+  def finalize(self):
+    """
+    :return: list of trajectories
+    """
+    return self.trajs
+
+
+class ArrayTrajectoryRecorder(object):
+  """
+  This class records the trajectories of the rollouts in preallocated arrays, one row per step:
+  observations of shape (batch_size, max_len, *obs_shape), rewards and dones of shape (batch_size, max_len).
+  The first row is the one of the reset. Being rarely filled, the infos are kept as a sparse list of (step, info)
+  with only the non empty infos of each rollout.
+  """
+  needs_infos = True
+
+  def __init__(self, batch_size, max_len, obs_shape):
+    """
+    Constructor
+    :param batch_size: Number of rollouts recorded together
+    :param max_len: Maximum number of entries of a trajectory, reset included
+    :param obs_shape: Shape of a single observation
+    """
+    self.batch_size = batch_size
+    self.max_len = max_len
+    self.obs_shape = tuple(obs_shape)
+
+  def init(self, observations):
+    observations = np.asarray(observations[:self.batch_size])
+    self.observations = np.empty((self.batch_size, self.max_len) + self.obs_shape, dtype=observations.dtype)
+    self.rewards = np.zeros((self.batch_size, self.max_len))
+    self.dones = np.zeros((self.batch_size, self.max_len), dtype=bool)
+    self.infos = [[] for i in range(self.batch_size)]
+    self.lengths = np.ones(self.batch_size, dtype=int)
+    self.observations[:, 0] = observations
+
+  def step(self, observations, rewards, dones, infos, active):
+    idx = np.flatnonzero(active)
+    assert np.all(self.lengths[idx] < self.max_len), 'Trajectory longer than {} steps'.format(self.max_len)
+    steps = self.lengths[idx]
+    self.observations[idx, steps] = np.asarray(observations[:self.batch_size])[idx]
+    self.rewards[idx, steps] = np.asarray(rewards[:self.batch_size])[idx]
+    self.dones[idx, steps] = np.asarray(dones[:self.batch_size])[idx]
+    for i, step in zip(idx, steps):
+      if infos[i]:
+        self.infos[i].append((step, infos[i]))
+    self.lengths[idx] += 1
+
+  def finalize(self):
+    """
+    :return: list of (observations, rewards, dones, infos). The arrays are views cut at the length of each rollout
+    """
+    return [(self.observations[i, :length], self.rewards[i, :length], self.dones[i, :length], self.infos[i])
+            for i, length in enumerate(self.lengths)]
+
+
+class RecordingBDStream(TrajectoryRecorder):
+  """
+  This class records the full trajectories and extracts the BDs from them with the given descriptor function.
+  Used for the descriptors that need the whole trajectory.
+  """
+  def __init__(self, genomes, descriptor):
+    super(RecordingBDStream, self).__init__(len(genomes))
+    self.genomes = genomes
+    self.descriptor = descriptor
+
+  def finalize(self):
+    """
+    :return: list of (bd, surprise)
+    """
+    return [self.descriptor(traj, {'genome': genome}) for traj, genome in zip(self.trajs, self.genomes)]
+
+
+class LastObservationBDStream(object):
+  """
+  This class keeps only the last observation of each rollout, that is used as BD
+  """
+  needs_infos = False
+
+  def __init__(self, genomes):
+    self.batch_size = len(genomes)
+    self.last_obs = None
+
+  def init(self, observations):
+    self.last_obs = np.array(observations[:self.batch_size])
+
+  def step(self, observations, rewards, dones, infos, active):
+    self.last_obs[active] = observations[:self.batch_size][active]
+
+  def finalize(self):
+    """
+    :return: list of (bd, surprise)
+    """
+    return [(self.last_obs[i], None) for i in range(self.batch_size)]
+# ---------------------------------------------------------
+
+
 class BehaviorDescriptor(object):
   """
   This class defines the behavior descriptor.
@@ -17,12 +140,39 @@ class BehaviorDescriptor(object):
 
     if self.params.exp_type == 'NS':
       self.descriptor = self.novelty_bd
+      # The last observation can be kept while the rollout happens only if traj_to_obs does not transform it.
+      # Otherwise the trajectory is recorded and given to traj_to_obs at the end.
+      if registered_envs[self.params.env_name].get('last_obs_bd', False):
+        self.stream_descriptor = LastObservationBDStream
+      else:
+        self.stream_descriptor = None
     else:
       raise ValueError("No behavior descriptor defined for experiment type {}".format(self.params.exp_type))
 
     # Function to extract the observations from the complete trajectory
     self.traj_to_obs = registered_envs[self.params.env_name]['traj_to_obs']
 
+  def get_bd_shape(self):
+    """
+    This function returns the shape of the BD of a single agent
+    :return:
+    """
+    if self.params.exp_type == 'NS':
+      return gym.make(registered_envs[self.params.env_name]['gym_name']).observation_space.shape # BD is an observation
+    else:
+      raise ValueError("No behavior descriptor defined for experiment type {}".format(self.params.exp_type))
+
+  def stream(self, genomes):
+    """
+    This function returns the BD stream used to extract the BDs of the given genomes while they are evaluated.
+    If the trajectories have to be recorded, the stream records them and extracts the BDs from them at the end.
+    :param genomes: Genomes evaluated together
+    :return:
+    """
+    if self.params.record_trajectories or self.stream_descriptor is None:
+      return RecordingBDStream(genomes, self.descriptor)
+    return self.stream_descriptor(genomes)
+
   def __call__(self, traj, agent, **kwargs):
     return self.descriptor(traj, agent, **kwargs)
 
@@ -3,12 +3,16 @@
 
 import numpy as np
 
+# The trajectory can be either the list of [obs, rew, done, info] or the array of observations of the recorded rollout
+
 def dummy_obs(traj):
   """
   Get observations from the trajectory coming from the dummy environment
   :param traj:
   :return:
   """
+  if isinstance(traj, np.ndarray):
+    return traj[-1:]
   return np.array([traj[-1][0]]) # Returns the observation of the last element
 
 def walker_2D_obs(traj):
@@ -17,4 +21,6 @@ def walker_2D_obs(traj):
   :param traj:
   :return:
   """
+  if isinstance(traj, np.ndarray):
+    return traj
   return np.array([t[0] for t in traj]) # t[0] selects the observation part
\ No newline at end of file
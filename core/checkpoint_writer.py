@@ -0,0 +1,78 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import threading
+import queue
+
+class CheckpointWriter(object):
+  """
+  This class writes the checkpoints on a background thread, so the search does not wait for the disk.
+  The jobs are executed in the order they are submitted. A job is a list of (function, args) writes, executed in order,
+  so all the writes of a checkpoint are submitted as a single job.
+  Backpressure: the queue of pending jobs is bounded. While the disk keeps up on average, submit returns right away. If
+  the disk is slower than the search, submit blocks once max_pending checkpoints are waiting, so the search slows
+  down to the disk speed and the snapshots kept in memory are bounded.
+  """
+  def __init__(self, max_pending=2):
+    """
+    Constructor
+    :param max_pending: Maximum number of jobs (i.e. checkpoints) waiting to be written
+    """
+    self.jobs = queue.Queue(maxsize=max_pending)
+    self.thread = threading.Thread(target=self._run, daemon=True)
+    self.thread.start()
+
+  def _run(self):
+    """
+    Loop of the writer thread. Executes the jobs until it gets None
+    :return:
+    """
+    while True:
+      job = self.jobs.get()
+      try:
+        if job is None:
+          return
+        for function, args in job: # A failed write does not stop the other ones of the checkpoint
+          try:
+            function(*args)
+          except Exception as e:
+            print('Checkpoint writing failed.')
+            print('Exception {}'.format(e))
+      finally:
+        self.jobs.task_done()
+
+  def submit(self, function, *args):
+    """
+    Submits a job made of a single write. Blocks only if the queue of pending jobs is full
+    :param function: Function writing the checkpoint
+    :param args: Arguments of the function. They must not be modified by the search after being submitted
+    :return:
+    """
+    self.submit_all([(function, args)])
+
+  def submit_all(self, writes):
+    """
+    Submits a job made of several writes, e.g. all the files of a checkpoint. Blocks only if the queue of pending jobs
+    is full
+    :param writes: list of (function, args). The args must not be modified by the search after being submitted
+    :return:
+    """
+    if not self.thread.is_alive():
+      raise RuntimeError('Checkpoint writer is closed')
+    self.jobs.put(list(writes))
+
+  def flush(self):
+    """
+    Waits until all the submitted jobs are written
+    :return:
+    """
+    self.jobs.join()
+
+  def close(self):
+    """
+    Writes all the pending jobs and stops the writer thread
+    :return:
+    """
+    if self.thread.is_alive():
+      self.jobs.put(None)
+      self.thread.join()
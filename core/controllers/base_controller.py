@@ -24,6 +24,22 @@ class BaseController(object):
     """
     self.genome = genome
 
+  def load_genomes(self, genomes):
+    """
+    This function loads a batch of genomes so to apply them in parallel with evaluate_batch
+    :param genomes: Genomes to load. One per row
+    :return:
+    """
+    self.genomes = genomes
+
+  def evaluate_batch(self, *args):
+    """
+    This function evaluates the batch of genomes on the batch of inputs. The i-th input is fed to the i-th genome.
+    :param x: Batch of inputs
+    :return:
+    """
+    raise NotImplementedError
+
   def evaluate(self, *args):
     """
     This function evaluates the genome on the given input
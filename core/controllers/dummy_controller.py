@@ -1,6 +1,7 @@
 # Created by Giuseppe Paolo 
 # Date: 28/07/2020
 
+import numpy as np
 from core.controllers import BaseController
 
 # ---------------------------------------------------------
@@ -18,7 +19,13 @@ class DummyController(BaseController):
   def load_genome(self, genome):
     self.genome = genome
 
+  def load_genomes(self, genomes):
+    self.genomes = np.asarray(genomes)
+
   def evaluate(self, *args):
     return self.genome
+
+  def evaluate_batch(self, *args):
+    return self.genomes
 # ---------------------------------------------------------
 
@@ -24,59 +24,65 @@ class FFNeuralController(BaseController):
                          self.hidden_layer_size*self.output_size + self.use_bias
     else:
       self.genome_size = self.input_size*self.output_size + self.use_bias
+    self.layout = self._get_layout()
   # ----------------------------------
 
   # ----------------------------------
-  def load_genome(self, genome):
+  def _get_layout(self):
     """
-    Loads the genome
-    :param genome: Genome as list of numbers
-    :return:
+    Calculates where each layer is in the genome. The genome is made of the weights of each layer, followed by its
+    bias if used.
+    :return: List of (start, end, shape, bias_idx) for each layer. bias_idx is None if the bias is not used
     """
-    assert len(genome) == self.genome_size, 'Wrong genome size. Expected {} - Given {}'.format(self.genome_size, len(genome))
-    self.layers = []
-    self.bias = []
-    idx = 0
     if self.hidden_layers > 0:
-      # Input to hidden
-      start = idx
-      end = start + self.input_size*self.hidden_layer_size
-      idx = end
-      layer = genome[start:end]
-      self.layers.append(np.reshape(layer, (self.input_size, self.hidden_layer_size)))
-      if self.use_bias:
-        self.bias.append(genome[idx])
-        idx += 1
-      # Hidden to hidden
-      for k in range(self.hidden_layers-1):
-        start = idx
-        end = start + self.hidden_layer_size*self.hidden_layer_size
-        idx = end
-        layer = genome[start:end]
-        self.layers.append(np.reshape(layer, (self.hidden_layer_size, self.hidden_layer_size)))
-        if self.use_bias:
-          self.bias.append(genome[idx])
-          idx += 1
-      # Hidden to output
+      shapes = [(self.input_size, self.hidden_layer_size)] + \
+               [(self.hidden_layer_size, self.hidden_layer_size)] * (self.hidden_layers - 1) + \
+               [(self.hidden_layer_size, self.output_size)]
+    else:
+      shapes = [(self.input_size, self.output_size)]
+
+    layout = []
+    idx = 0
+    for shape in shapes:
       start = idx
-      end = start + self.hidden_layer_size * self.output_size
+      end = start + shape[0]*shape[1]
       idx = end
-      layer = genome[start:end]
-      self.layers.append(np.reshape(layer, (self.hidden_layer_size, self.output_size)))
       if self.use_bias:
-        self.bias.append(genome[idx])
+        layout.append((start, end, shape, idx))
         idx += 1
-    else:
-      idx = self.input_size * self.output_size
-      layer = genome[0:idx]
-      self.layers.append(np.reshape(layer, (self.input_size, self.output_size)))
-      if self.use_bias:
-        self.bias.append(genome[idx])
+      else:
+        layout.append((start, end, shape, None))
+    assert idx == self.genome_size, 'Layout not matching genome size. Layout {} - Genome size {}'.format(idx, self.genome_size)
+    return layout
+  # ----------------------------------
 
+  # ----------------------------------
+  def load_genome(self, genome):
+    """
+    Loads the genome. The layers are views on the genome, so no data is copied
+    :param genome: Genome as array of numbers
+    :return:
+    """
+    genome = np.asarray(genome)
+    assert len(genome) == self.genome_size, 'Wrong genome size. Expected {} - Given {}'.format(self.genome_size, len(genome))
+    self.layers = [genome[start:end].reshape(shape) for start, end, shape, _ in self.layout]
     if self.use_bias:
-      assert len(self.bias) == len(self.layers), 'Not enough bias or layers. Bias {} - Layers {}'.format(len(self.bias), len(self.layers))
+      self.bias = [genome[bias_idx] for _, _, _, bias_idx in self.layout]
   # ----------------------------------
 
+  # ----------------------------------
+  def load_genomes(self, genomes):
+    """
+    Loads a batch of genomes. The weights of each layer are a view of shape (batch, in, out) on the genomes matrix
+    and the biases a view of shape (batch,)
+    :param genomes: Genomes as matrix with one genome per row
+    :return:
+    """
+    genomes = np.asarray(genomes)
+    assert genomes.shape[1] == self.genome_size, 'Wrong genome size. Expected {} - Given {}'.format(self.genome_size, genomes.shape[1])
+    self.batch_layers = [genomes[:, start:end].reshape((len(genomes),) + shape) for start, end, shape, _ in self.layout]
+    if self.use_bias:
+      self.batch_bias = [genomes[:, bias_idx] for _, _, _, bias_idx in self.layout]
   # ----------------------------------
   def evaluate(self, *args):
     """
@@ -94,5 +100,23 @@ class FFNeuralController(BaseController):
         data = self.bias[i] + data
       data = (expit(data)*2) - 1 # This way we translate the sigmoid in the [-1, 1] interval
     return data[0]
+
+  def evaluate_batch(self, *args):
+    """
+    Evaluates the batch of agents loaded with load_genomes. The i-th input is fed to the i-th agent.
+    :param args: Inputs of shape (batch, input_size)
+    :return: Outputs of the networks of shape (batch, output_size)
+    """
+    assert len(args) == 1, 'Too many inputs given to controller. Expected 1 - Given {}'.format(len(args))
+    data = np.asarray(args[0])
+    assert data.shape == (len(self.batch_layers[0]), self.input_size), 'Wrong input shape. Expected {} - Given {}'.format((len(self.batch_layers[0]), self.input_size), data.shape)
+    data = np.expand_dims(data, axis=1) # Each input is a (1, input_size) row vector
+
+    for i in range(len(self.batch_layers)):
+      data = np.matmul(data, self.batch_layers[i])
+      if self.use_bias:
+        data = self.batch_bias[i][:, None, None] + data
+      data = (expit(data)*2) - 1 # This way we translate the sigmoid in the [-1, 1] interval
+    return data[:, 0]
   # ----------------------------------
 # ---------------------------------------------------------
@@ -0,0 +1,86 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+from scipy.special import rel_entr
+
+class CoverageTracker(object):
+  """
+  This class keeps the occupancy histogram of a set of points (e.g. the BDs of the archive) on the grid of the env,
+  so that coverage and uniformity can be calculated while the points are added.
+  The histogram is the one given by analysis.utils.get_grid on the first two dimensions of the points, with the points
+  outside the grid discarded.
+  Each cell with the same count gives the same contribution to the uniformity, so the tracker also keeps how many cells
+  have each count. This way adding a point costs O(1) and the metrics cost O(number of different counts).
+  """
+  def __init__(self, grid_parameters):
+    """
+    Constructor
+    :param grid_parameters: dict with min_coord, max_coord and bins, as in the registered envs
+    """
+    self.bins = grid_parameters['bins']
+    self.min_coord = np.array(grid_parameters['min_coord'][:2], dtype=np.float64)
+    self.max_coord = np.array(grid_parameters['max_coord'][:2], dtype=np.float64)
+    self.edges = [np.linspace(self.min_coord[d], self.max_coord[d], self.bins + 1) for d in range(2)]
+    self.reset()
+
+  def reset(self):
+    """
+    Empties the histogram
+    :return:
+    """
+    self.counts = np.zeros((self.bins, self.bins), dtype=np.int64) # Indexed as [x bin, y bin]
+    self.count_cells = {0: self.bins * self.bins} # Number of cells for each count
+    self.points = 0
+
+  def add(self, points):
+    """
+    Adds the points to the histogram
+    :param points: Array of shape (n, dim), with dim >= 2
+    :return:
+    """
+    if len(points) == 0:
+      return
+    points = np.reshape(np.array(list(points), dtype=np.float64), (len(points), -1))[:, :2]
+    inside = np.all((points >= self.min_coord) & (points <= self.max_coord), axis=1)
+    # Same binning of np.histogram2d: the last bin includes the right edge
+    cells = np.stack([np.searchsorted(self.edges[d], points[inside, d], side='right') - 1 for d in range(2)], axis=1)
+    cells = np.minimum(cells, self.bins - 1)
+    for x, y in cells:
+      count = self.counts[x, y]
+      self.count_cells[count] -= 1
+      if self.count_cells[count] == 0:
+        del self.count_cells[count]
+      self.count_cells[count + 1] = self.count_cells.get(count + 1, 0) + 1
+      self.counts[x, y] = count + 1
+    self.points += len(cells)
+
+  def histogram(self):
+    """
+    Returns the histogram oriented as the one of analysis.utils.get_grid
+    :return:
+    """
+    return self.counts.T[::-1, :].astype(np.float64)
+
+  @property
+  def coverage(self):
+    """
+    Fraction of occupied cells. Same as analysis.utils.calculate_coverage
+    """
+    return 1 - self.count_cells.get(0, 0) / self.counts.size
+
+  @property
+  def uniformity(self):
+    """
+    1 - Jensen-Shannon distance between the normed histogram and the uniform one.
+    Same as analysis.utils.calculate_uniformity
+    """
+    if self.points == 0:
+      return np.nan
+    counts = np.array(list(self.count_cells.keys()), dtype=np.float64)
+    cells = np.array(list(self.count_cells.values()), dtype=np.float64)
+    p = counts / self.points
+    u = 1. / self.counts.size
+    m = (p + u) / 2
+    js = np.sum(cells * (rel_entr(p, m) + rel_entr(u, m)))
+    return 1 - np.sqrt(js / 2)
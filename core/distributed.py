@@ -0,0 +1,352 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import copy
+import time
+import hmac
+import socket
+import select
+import struct
+import pickle as pkl
+import threading
+from collections import deque
+
+# Evaluation distributed over TCP.
+# The coordinator (DistributedEvaluator) waits for the workers on an address. Each worker connects, authenticates and
+# receives the parameters, with which it instantiates its own evaluator. Then it evaluates the chunks of genomes the
+# coordinator sends, while sending heartbeats. Workers that disconnect or stop sending heartbeats are dropped and their
+# chunks are given to other workers. Errors raised by the evaluation are sent back and raised by the coordinator.
+# Messages are pickled tuples prefixed by their length. Before any message is unpickled, coordinator and worker prove
+# to each other that they know the authkey with an HMAC challenge on raw bytes, so the key is never sent. The messages
+# are not encrypted: use it only on trusted networks.
+
+AUTHKEY_ENV = 'NS_AUTHKEY' # Env var from which the authkey is read if not given otherwise
+HEADER = struct.Struct('!Q')
+CHALLENGE_SIZE = 32
+MAX_HANDSHAKE_SIZE = 1024 # Max size of the raw messages exchanged before the authentication
+HANDSHAKE_TIMEOUT = 10. # Seconds a connecting worker has to authenticate
+
+def _send_bytes(sock, data):
+  """
+  Sends the bytes prefixed by their length
+  :param sock:
+  :param data:
+  :return:
+  """
+  sock.sendall(HEADER.pack(len(data)) + data)
+
+def _recv_bytes(sock, max_size=None):
+  """
+  Receives length prefixed bytes
+  :param sock:
+  :param max_size: If given, longer messages are refused
+  :return:
+  """
+  size, = HEADER.unpack(_recv_exactly(sock, HEADER.size))
+  if max_size is not None and size > max_size:
+    raise ConnectionError('Message too long')
+  return _recv_exactly(sock, size)
+
+def send_message(sock, message):
+  """
+  Sends the message as a length prefixed pickle
+  :param sock:
+  :param message:
+  :return:
+  """
+  _send_bytes(sock, pkl.dumps(message, protocol=pkl.HIGHEST_PROTOCOL))
+
+def _recv_exactly(sock, size):
+  """
+  Receives exactly size bytes from the socket
+  :param sock:
+  :param size:
+  :return:
+  """
+  data = bytearray()
+  while len(data) < size:
+    chunk = sock.recv(min(size - len(data), 1 << 20))
+    if not chunk:
+      raise ConnectionError('Connection closed')
+    data += chunk
+  return bytes(data)
+
+def recv_message(sock):
+  """
+  Receives a length prefixed pickled message
+  :param sock:
+  :return:
+  """
+  return pkl.loads(_recv_bytes(sock))
+
+def authenticate(sock, authkey, role):
+  """
+  Mutual authentication. Each side sends a random challenge and answers the one of the other side with the HMAC of
+  its role and the challenge, computed with the authkey. The role is in the HMAC so that a challenge cannot be sent
+  back to the side that generated it to get the answer. Only raw bytes are exchanged.
+  :param sock:
+  :param authkey: bytes
+  :param role: 'coordinator' or 'worker'
+  :return:
+  """
+  other_role = 'worker' if role == 'coordinator' else 'coordinator'
+  challenge = os.urandom(CHALLENGE_SIZE)
+  _send_bytes(sock, challenge)
+  other_challenge = _recv_bytes(sock, MAX_HANDSHAKE_SIZE)
+  _send_bytes(sock, hmac.new(authkey, role.encode() + other_challenge, 'sha256').digest())
+  answer = _recv_bytes(sock, MAX_HANDSHAKE_SIZE)
+  if not hmac.compare_digest(answer, hmac.new(authkey, other_role.encode() + challenge, 'sha256').digest()):
+    raise ConnectionError('Authentication failed')
+
+def parse_address(address):
+  """
+  Parses an address given as host:port
+  :param address:
+  :return: (host, port)
+  """
+  host, port = address.rsplit(':', 1)
+  return host, int(port)
+
+
+class WorkerConnection(object):
+  """
+  Connection of the coordinator with a worker
+  """
+  def __init__(self, sock, address):
+    self.sock = sock
+    self.address = address
+    self.last_seen = time.time()
+    self.task = None # Task the worker is evaluating
+
+
+class DistributedEvaluator(object):
+  """
+  This class sends the genomes to evaluate to the workers connected over TCP and collects the results.
+  The workers are accepted in background, so they can join or leave at any time during the search.
+  """
+  def __init__(self, parameters):
+    """
+    Constructor. Starts waiting for the workers on parameters.distributed_address
+    :param parameters:
+    """
+    self.params = parameters
+    authkey = self.params.distributed_authkey or os.environ.get(AUTHKEY_ENV, '')
+    if not authkey:
+      raise ValueError('Distributed evaluation needs a distributed_authkey or the {} env var'.format(AUTHKEY_ENV))
+    self.authkey = authkey.encode()
+    self.worker_params = copy.copy(self.params) # Sent to the workers, without the key
+    self.worker_params.distributed_authkey = ''
+    self.heartbeat = self.params.distributed_heartbeat
+    self.timeout = 3 * self.heartbeat # Workers not heard for this long are considered lost
+    self.workers = []
+    self.new_workers = deque()
+    self.calls = 0
+
+    self.server = socket.create_server(parse_address(self.params.distributed_address))
+    self.server.settimeout(0.5) # So that the accepting thread can check if the evaluator is closed
+    self.address = '{}:{}'.format(*self.server.getsockname()[:2])
+    self.closed = False
+    self.accept_thread = threading.Thread(target=self._accept, daemon=True)
+    self.accept_thread.start()
+    print('Waiting for evaluation workers on {}'.format(self.address))
+
+  # ---------------------------------
+  def _accept(self):
+    """
+    Accepts the workers. Each one is authenticated on its own thread, so peers that do not answer do not keep the
+    other workers from joining
+    :return:
+    """
+    while not self.closed:
+      try:
+        sock, address = self.server.accept()
+      except socket.timeout:
+        continue
+      except OSError: # Server closed
+        return
+      threading.Thread(target=self._handshake, args=(sock, address), daemon=True).start()
+
+  def _handshake(self, sock, address):
+    """
+    Authenticates the worker and sends it the parameters. Peers that do not complete it within HANDSHAKE_TIMEOUT
+    are refused.
+    :param sock:
+    :param address:
+    :return:
+    """
+    try:
+      sock.settimeout(HANDSHAKE_TIMEOUT)
+      authenticate(sock, self.authkey, 'coordinator')
+      send_message(sock, ('params', self.worker_params, self.heartbeat))
+      sock.settimeout(self.timeout) # As for the heartbeats, so a stuck worker does not block the sends
+      sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except Exception as e:
+      print('Refused worker {}: {}'.format(address, e))
+      sock.close()
+      return
+    if self.closed:
+      sock.close()
+      return
+    self.new_workers.append(WorkerConnection(sock, address))
+    if self.params.verbose: print('Worker {} connected'.format(address))
+
+  def _drop(self, worker, pending):
+    """
+    Drops the worker. Its task is put back among the pending ones
+    :param worker:
+    :param pending: deque of pending tasks
+    :return:
+    """
+    print('Lost evaluation worker {}'.format(worker.address))
+    if worker.task is not None:
+      pending.appendleft(worker.task[1])
+    worker.sock.close()
+    self.workers.remove(worker)
+
+  @property
+  def size(self):
+    """
+    Number of connected workers
+    """
+    return len(self.workers) + len(self.new_workers)
+  # ---------------------------------
+
+  # ---------------------------------
+  def evaluate(self, chunks):
+    """
+    This function evaluates the chunks of genomes on the workers. Each worker evaluates a chunk at a time.
+    If the evaluation of a chunk fails on a worker, a RuntimeError with the error of the worker is raised.
+    :param chunks: list of genomes matrices
+    :return: list with the results of each chunk
+    """
+    self.calls += 1
+    results = [None] * len(chunks)
+    pending = deque(range(len(chunks)))
+    done = 0
+    waiting = False
+
+    while done < len(chunks):
+      while self.new_workers:
+        self.workers.append(self.new_workers.popleft())
+
+      # Give a chunk to each idle worker
+      for worker in [worker for worker in self.workers if worker.task is None]:
+        if not pending:
+          break
+        task = (self.calls, pending.popleft())
+        worker.task = task
+        try:
+          send_message(worker.sock, ('task', task, chunks[task[1]]))
+        except Exception:
+          self._drop(worker, pending)
+
+      if not self.workers:
+        if not waiting:
+          print('No evaluation workers connected. Waiting...')
+          waiting = True
+        time.sleep(0.1)
+        continue
+      waiting = False
+
+      readable, _, _ = select.select([worker.sock for worker in self.workers], [], [], min(self.heartbeat, 1.))
+      for worker in [worker for worker in self.workers if worker.sock in readable]:
+        try:
+          message = recv_message(worker.sock)
+        except Exception:
+          self._drop(worker, pending)
+          continue
+        worker.last_seen = time.time()
+        if message[0] in ['result', 'error'] and message[1] == worker.task:
+          worker.task = None
+          if message[0] == 'error':
+            raise RuntimeError('Evaluation failed on worker {}: {}'.format(worker.address, message[2]))
+          if message[1][0] == self.calls: # Not a late result of a call that failed
+            results[message[1][1]] = message[2]
+            done += 1
+
+      for worker in [worker for worker in self.workers if time.time() - worker.last_seen > self.timeout]:
+        self._drop(worker, pending)
+    return results
+
+  def close(self):
+    """
+    Disconnects the workers and stops waiting for new ones
+    :return:
+    """
+    self.closed = True
+    self.accept_thread.join()
+    self.server.close()
+    for worker in self.workers + list(self.new_workers):
+      try:
+        send_message(worker.sock, ('close',))
+      except Exception:
+        pass
+      worker.sock.close()
+    self.workers = []
+    self.new_workers.clear()
+  # ---------------------------------
+
+
+# ---------------------------------
+def run_worker(address, authkey, reconnect=True):
+  """
+  This function runs an evaluation worker. It connects to the coordinator and evaluates the genomes it receives.
+  :param address: host:port of the coordinator
+  :param authkey: key needed to connect to the coordinator
+  :param reconnect: If True, when the coordinator closes the connection, the worker waits for the next one
+  :return:
+  """
+  from core import searcher # Imported here, given that the searcher uses this module
+
+  if not authkey:
+    raise ValueError('The evaluation worker needs the authkey of the coordinator')
+  while True:
+    try:
+      sock = socket.create_connection(parse_address(address))
+    except OSError:
+      time.sleep(1) # Coordinator not up yet
+      continue
+    print('Connected to {}'.format(address))
+    try:
+      sock.settimeout(60) # Until authenticated, so a coordinator that does not answer is not waited forever
+      authenticate(sock, authkey.encode(), 'worker')
+      sock.settimeout(None)
+      _, parameters, heartbeat = recv_message(sock)
+      sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+      searcher.init_process(parameters)
+
+      lock = threading.Lock() # Heartbeats and results are sent from different threads
+      stop = threading.Event()
+      def send_heartbeats():
+        while not stop.wait(heartbeat):
+          try:
+            with lock:
+              send_message(sock, ('heartbeat',))
+          except OSError:
+            return
+      threading.Thread(target=send_heartbeats, daemon=True).start()
+
+      try:
+        while True:
+          message = recv_message(sock)
+          if message[0] == 'close':
+            break
+          _, task, genomes = message
+          try:
+            reply = ('result', task, searcher.evaluate_genomes(genomes))
+          except Exception as e: # Sent to the coordinator, that raises it, instead of giving the task to another worker
+            print('Evaluation failed: {}'.format(repr(e)))
+            reply = ('error', task, repr(e))
+          with lock:
+            send_message(sock, reply)
+      finally:
+        stop.set()
+    except (ConnectionError, OSError) as e:
+      print('Connection with {} lost: {}'.format(address, e))
+    finally:
+      sock.close()
+    if not reconnect:
+      return
+    print('Waiting for the next search...')
+# ---------------------------------
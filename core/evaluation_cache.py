@@ -0,0 +1,65 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import hashlib
+import numpy as np
+from collections import OrderedDict
+
+class EvaluationCache(object):
+  """
+  This class implements an LRU cache of the evaluations of the genomes.
+  The key is the hash of the genome bytes together with the env name and the seed, given that with a fixed seed
+  the evaluation of a genome is deterministic. Each entry contains the (reward, bd, surprise) of the genome.
+  """
+  def __init__(self, env_name, seed, max_size=10000):
+    """
+    Constructor
+    :param env_name:
+    :param seed:
+    :param max_size: Maximum number of evaluations kept. When full, the least recently used one is dropped
+    """
+    self.env_name = env_name
+    self.seed = seed
+    self.max_size = max_size
+    self.data = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def __len__(self):
+    return len(self.data)
+
+  def key(self, genome):
+    """
+    Returns the key of the genome
+    :param genome:
+    :return:
+    """
+    genome_hash = hashlib.sha1(np.ascontiguousarray(genome, dtype=np.float64).tobytes()).hexdigest()
+    return self.env_name, self.seed, genome_hash
+
+  def get(self, genome):
+    """
+    Returns the evaluation of the genome, if it is in the cache
+    :param genome:
+    :return: (reward, bd, surprise) or None
+    """
+    key = self.key(genome)
+    if key not in self.data:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self.data.move_to_end(key)
+    return self.data[key]
+
+  def put(self, genome, evaluation):
+    """
+    Stores the evaluation of the genome
+    :param genome:
+    :param evaluation: (reward, bd, surprise)
+    :return:
+    """
+    key = self.key(genome)
+    self.data[key] = evaluation
+    self.data.move_to_end(key)
+    while len(self.data) > self.max_size:
+      self.data.popitem(last=False)
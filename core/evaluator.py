@@ -2,6 +2,8 @@
 # Date: 27/07/2020
 
 from environments.environments import registered_envs
+from core.behavior_descriptors.behavior_descriptors import TrajectoryRecorder, ArrayTrajectoryRecorder
+import numpy as np
 import gym
 
 class Evaluator(object):
@@ -19,35 +21,39 @@ class Evaluator(object):
     self.env = registered_envs[self.params.env_name]
     print("Instantiating environment: {}".format(self.env['gym_name']))
     self.gym_env = gym.make(self.env['gym_name'])
-
-    if self.params.seed is not None:
-      self.gym_env.seed(self.params.seed)
-      self.gym_env.action_space.seed(self.params.seed)
-      self.gym_env.observation_space.seed(self.params.seed)
+    self.seed_env(self.gym_env)
 
     self.controller = self.env['controller']['controller'](input_size=self.env['controller']['input_size'],
                                                            output_size=self.env['controller']['output_size'],
                                                            name=self.env['controller']['name'])
     self.max_steps = self.env['max_steps']
 
-  def evaluate(self, agent):
+  def seed_env(self, env):
     """
-    This function evaluates the agent in the env
-    :param agent:
-    :param data_collection: If flag is given we collect the data to train the AE
+    Seeds the env with the parameters seed, so that every rollout starts from the same conditions
+    :param env:
     :return:
     """
-    self.controller.load_genome(agent['genome'])
-    traj = []
+    if self.params.seed is not None:
+      env.seed(self.params.seed)
+      env.action_space.seed(self.params.seed)
+      env.observation_space.seed(self.params.seed)
+
+  def rollout(self, genome, bd_stream):
+    """
+    This function evaluates the genome in the env. Each step is fed to the BD stream as it happens.
+    :param genome:
+    :param bd_stream: Stream that receives the steps, as a batch of a single rollout
+    :return: cumulated reward
+    """
+    self.controller.load_genome(genome)
     done = False
     cumulated_reward = 0
+    active = np.ones(1, dtype=bool)
 
-    if self.params.seed is not None:
-      self.gym_env.seed(self.params.seed)
-      self.gym_env.action_space.seed(self.params.seed)
-      self.gym_env.observation_space.seed(self.params.seed)
+    self.seed_env(self.gym_env)
     obs = self.gym_env.reset()
-    traj.append((obs, 0, done, {}))
+    bd_stream.init(np.array([obs]))
     t = 0
 
     while not done:
@@ -59,9 +65,44 @@ class Evaluator(object):
 
       if t >= self.max_steps:
         done = True
-      traj.append((obs, reward, done, info))
+      bd_stream.step(np.array([obs]), [reward], [done], [info], active)
       t += 1
-    return cumulated_reward, traj
+    return cumulated_reward
+
+  def evaluate(self, agent):
+    """
+    This function evaluates the agent in the env and records the whole trajectory
+    :param agent:
+    :return: cumulated reward, trajectory as list of (obs, reward, done, info)
+    """
+    recorder = TrajectoryRecorder(1)
+    cumulated_reward = self.rollout(agent['genome'], recorder)
+    return cumulated_reward, recorder.finalize()[0]
+
+  def record(self, agent):
+    """
+    This function evaluates the agent in the env and records the whole trajectory in preallocated arrays.
+    The trajectory has at most max_steps + 2 entries: the reset plus the steps until t reaches max_steps.
+    :param agent:
+    :return: cumulated reward, observations, rewards, dones, sparse list of (step, info) of the non empty infos
+    """
+    recorder = ArrayTrajectoryRecorder(1, self.max_steps + 2, self.gym_env.observation_space.shape)
+    cumulated_reward = self.rollout(agent['genome'], recorder)
+    return (cumulated_reward,) + recorder.finalize()[0]
+
+  def evaluate_genomes(self, genomes, bd_extractor):
+    """
+    This function evaluates the genomes in the environment and extracts their BDs while the rollouts happen
+    :param genomes: list or matrix of genomes
+    :param bd_extractor:
+    :return: list of (cumulated_reward, bd, surprise), one for each genome
+    """
+    results = []
+    for genome in genomes:
+      bd_stream = bd_extractor.stream([genome])
+      cumulated_rew = self.rollout(genome, bd_stream)
+      results.append((cumulated_rew,) + tuple(bd_stream.finalize()[0]))
+    return results
 
   def __call__(self, agent, bd_extractor=None):
     """
@@ -75,3 +116,148 @@ class Evaluator(object):
     agent['bd'] = bd
     agent['surprise'] = surprise
     return agent
+
+
+class BatchEvaluator(Evaluator):
+  """
+  This class evaluates batches of controllers in lockstep, each one on its own copy of the environment.
+  At every step the controller is called only once, on the observations of the whole batch.
+  The agents whose episode is over are masked out: their env is not stepped anymore and their actions are discarded.
+  If the env has a vectorized version, all the copies are stepped with a single call to it.
+  """
+  def __init__(self, params, batch_size=None):
+    """
+    Constructor
+    :param params:
+    :param batch_size: Number of agents evaluated in lockstep. If None it is taken from the parameters
+    """
+    super(BatchEvaluator, self).__init__(params)
+    self.batch_size = self.params.eval_batch_size if batch_size is None else batch_size
+    assert self.batch_size > 0, 'Batch size must be positive. Given {}'.format(self.batch_size)
+    if self.env.get('vector_gym_name') is not None:
+      self.vector_env = gym.make(self.env['vector_gym_name'], num_envs=self.batch_size)
+    else:
+      self.vector_env = None
+      self.gym_envs = [self.gym_env] + [gym.make(self.env['gym_name']) for k in range(self.batch_size - 1)]
+
+  def _rollout_batches(self, genomes, get_stream):
+    """
+    This function evaluates the genomes in the env, batch_size of them at a time
+    :param genomes: list or matrix of genomes
+    :param get_stream: function returning the stream for a batch of genomes
+    :return: list of (cumulated_reward, stream result), one for each genome
+    """
+    rollout = self._rollout_chunk if self.vector_env is None else self._rollout_vector_chunk
+    results = []
+    for start in range(0, len(genomes), self.batch_size):
+      chunk = genomes[start:start + self.batch_size]
+      bd_stream = get_stream(chunk)
+      cumulated_rewards = rollout(chunk, bd_stream)
+      results += list(zip(cumulated_rewards, bd_stream.finalize()))
+    return results
+
+  def evaluate_batch(self, genomes):
+    """
+    This function evaluates the genomes in the env, batch_size of them at a time, and records the trajectories
+    :param genomes: list or matrix of genomes
+    :return: list of (cumulated_reward, traj), one for each genome
+    """
+    return self._rollout_batches(genomes, lambda chunk: TrajectoryRecorder(len(chunk)))
+
+  def _rollout_chunk(self, genomes, bd_stream):
+    """
+    This function evaluates at most batch_size genomes in lockstep
+    :param genomes:
+    :param bd_stream: Stream that receives the steps of the batch
+    :return: list of cumulated rewards
+    """
+    self.controller.load_genomes(np.asarray(genomes))
+    envs = self.gym_envs[:len(genomes)]
+    active = np.ones(len(envs), dtype=bool)
+    cumulated_rewards = [0] * len(envs)
+    rewards = [0] * len(envs)
+    dones = [False] * len(envs)
+    infos = [{}] * len(envs)
+
+    observations = []
+    for env in envs:
+      self.seed_env(env)
+      observations.append(env.reset())
+    bd_stream.init(np.array(observations))
+    t = 0
+
+    while np.any(active):
+      agent_input = self.env['controller']['input_formatter'](t/self.max_steps, np.array(observations))
+      actions = self.env['controller']['output_formatter'](self.controller.evaluate_batch(agent_input))
+
+      stepped = active.copy()
+      for i in np.flatnonzero(active):
+        observations[i], rewards[i], dones[i], infos[i] = envs[i].step(actions[i])
+        cumulated_rewards[i] += rewards[i]
+
+        if t >= self.max_steps:
+          dones[i] = True
+        active[i] = not dones[i]
+      bd_stream.step(np.array(observations), rewards, dones, infos, stepped)
+      t += 1
+    return cumulated_rewards
+
+  def _rollout_vector_chunk(self, genomes, bd_stream):
+    """
+    This function evaluates at most batch_size genomes in lockstep on the vectorized env.
+    If there are less genomes than envs, the envs in excess are fed null actions and their outputs discarded.
+    :param genomes:
+    :param bd_stream: Stream that receives the steps of the batch
+    :return: list of cumulated rewards
+    """
+    self.controller.load_genomes(np.asarray(genomes))
+    n = len(genomes)
+    active = np.ones(n, dtype=bool)
+    cumulated_rewards = np.zeros(n)
+
+    self.seed_env(self.vector_env)
+    observations = self.vector_env.reset()
+    bd_stream.init(observations[:n])
+    actions = np.zeros(self.vector_env.action_space.shape)
+    t = 0
+
+    while np.any(active):
+      agent_input = self.env['controller']['input_formatter'](t/self.max_steps, observations[:n])
+      actions[:n] = self.env['controller']['output_formatter'](self.controller.evaluate_batch(agent_input))
+
+      observations, rewards, dones, infos = self.vector_env.step(actions)
+      if t >= self.max_steps:
+        dones = np.ones_like(dones)
+      if bd_stream.needs_infos:
+        infos = [{key: infos[key][i] for key in infos} for i in range(n)]
+      else:
+        infos = None
+
+      cumulated_rewards[active] += rewards[:n][active]
+      bd_stream.step(observations[:n], rewards[:n], dones[:n], infos, active)
+      active = active & ~dones[:n]
+      t += 1
+    return list(cumulated_rewards)
+
+  def evaluate_genomes(self, genomes, bd_extractor):
+    """
+    This function evaluates the genomes in the environment, in batches, and extracts their BDs while the rollouts happen
+    :param genomes: list or matrix of genomes
+    :param bd_extractor:
+    :return: list of (cumulated_reward, bd, surprise), one for each genome
+    """
+    return [(cumulated_rew,) + tuple(result) for cumulated_rew, result in self._rollout_batches(genomes, bd_extractor.stream)]
+
+  def __call__(self, agents, bd_extractor=None):
+    """
+    This function evaluates the list of agents in the environment
+    :param agents:
+    :return: list of evaluated agents
+    """
+    results = self.evaluate_batch([agent['genome'] for agent in agents])
+    for agent, (cumulated_rew, traj) in zip(agents, results):
+      agent['reward'] = cumulated_rew
+      bd, surprise = bd_extractor(traj, agent)
+      agent['bd'] = bd
+      agent['surprise'] = surprise
+    return agents
@@ -2,4 +2,5 @@
 # Date: 27/07/2020
 
 from core.evolvers.base_evolver import BaseEvolver
-from core.evolvers.ns import NoveltySearch
\ No newline at end of file
+from core.evolvers.ns import NoveltySearch
+from core.evolvers.steady_state_ns import SteadyStateNoveltySearch
\ No newline at end of file
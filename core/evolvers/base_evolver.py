@@ -2,8 +2,32 @@
 # Date: 09/03/2020
 
 import numpy as np
-from core.population import Population
+from core.population import make_population
 from core.population import Archive
+from core import random_streams
+
+
+def mutate_block(genomes, parameters, entropy, keys):
+  """
+  This function mutates a block of genomes with the noise drawn from the stream identified by the keys.
+  NB: The genomes are clipped in the genome limits
+  It is a function and not a method so that only the genomes and the parameters are sent to the workers of the pool.
+  :param genomes: Matrix of genomes to mutate
+  :param parameters:
+  :param entropy: Entropy of the experiment
+  :param keys: Keys of the random stream
+  :return: Mutated genomes
+  """
+  rng = random_streams.get_generator(entropy, *keys)
+  noise = getattr(rng, parameters.mutation_operator)(parameters.mutation_parameters['mu'],
+                                                     parameters.mutation_parameters['sigma'], np.shape(genomes))
+  return np.clip(genomes + noise, parameters.genome_limit[0], parameters.genome_limit[1])
+
+def _mutate_block(args):
+  """
+  Unpacks the arguments for mutate_block when called through pool.map
+  """
+  return mutate_block(*args)
 
 class BaseEvolver(object):
   """
@@ -16,56 +40,41 @@ class BaseEvolver(object):
     self.params = parameters
     self.sigma = self.params.mutation_parameters['sigma']
     self.mu = self.params.mutation_parameters['mu']
-    self.mutation_operator = np.random.normal
+    self.mutation_operator = self.params.mutation_operator
     self.archive = Archive(self.params)
+    self.entropy = random_streams.get_entropy(self.params.seed)
+    self.generation = 0 # Used to select the random streams. It is incremented every time the population is updated
     self.update_criteria = None # ['fitness', 'novelty', 'surprise']
     self.agent_template = self.params.agent_template
 
-  def mutate_genome(self, genome):
-    """
-    This function mutates the genome by using the mutation operator.
-    NB: The genome is clipped in the range [-1, 1]
-    :param genome:
-    :return:
-    """
-    genome = np.clip(genome + self.mutation_operator(self.mu, self.sigma, np.shape(genome)),
-                     self.params.genome_limit[0], self.params.genome_limit[1])
-    return genome
-
-  def _generate_off(self, parent_id_gen):
-    """
-    This function generates the offsprings from a given parent
-    :param parent_id_gen: A tuple containing (parent_id, parent_genome)
-    :return: list of offsprings
-    """
-    offsprings = []
-    for k in range(self.params.offsprings_per_parent):
-      off = self.agent_template.copy() # Get new agent
-      off['genome'] = self.mutate_genome(parent_id_gen[1]) # Add parent mutate genome
-      off['parent'] = parent_id_gen[0] # Add parent ID
-      offsprings.append(off)
-    return offsprings
-
   def generate_offspring(self, parents, pool=None):
     """
-    This function generates the offspring from the population
+    This function generates the offspring from the population.
+    The parents are split in blocks of mutation_block_size. Each parent genome is repeated offsprings_per_parent times
+    and each block is mutated with a single draw from its own random stream. The offsprings are then the same,
+    whether the blocks are mutated by the pool or not.
     :return: Population of offsprings
     """
-    offsprings = Population(self.params, init_size=0, name='offsprings')
+    offsprings = make_population(self.params, init_size=0, name='offsprings')
 
-    parent_genome = parents['genome']
+    parent_genome = np.asarray(parents['genome'])
     parent_ids = parents['id']
 
+    blocks = []
+    for block, start in enumerate(range(0, len(parent_genome), self.params.mutation_block_size)):
+      genomes = np.repeat(parent_genome[start:start + self.params.mutation_block_size], self.params.offsprings_per_parent, axis=0)
+      blocks.append((genomes, self.params, self.entropy, (random_streams.MUTATION_STREAM, self.generation, block)))
+
     if pool is not None:
-      offs = pool.map(self._generate_off, zip(parent_ids, parent_genome))
+      off_genomes = pool.map(_mutate_block, blocks)
     else:
-      offs = []
-      for id_gen in zip(parent_ids, parent_genome): # Generate offsprings from each parent
-        offs.append(self._generate_off(id_gen))
+      off_genomes = [_mutate_block(block) for block in blocks]
+    off_genomes = np.concatenate(off_genomes) if off_genomes else np.empty((0, parents.genome_size))
 
-    offsprings.pop = [off for p_off in offs for off in p_off]  # Unpack list of lists and add it to offsprings
-    offs_ids = parents.agent_id + np.array(range(len(offsprings)))  # Calculate offs IDs
-    offsprings['id'] = offs_ids  # Update offs IDs
+    offs_ids = parents.agent_id + np.arange(len(off_genomes))  # Calculate offs IDs
+    offsprings.set_agents(genome=off_genomes,
+                          parent=np.repeat(parent_ids, self.params.offsprings_per_parent),
+                          id=offs_ids)
     parents.agent_id = max(offs_ids) + 1 # This saves the maximum ID reached till now
     return offsprings
 
@@ -76,12 +85,12 @@ class BaseEvolver(object):
     """
     Updates the archive according to the strategy and the criteria given.
     :param offsprings:
-    :return:
+    :return: list of indexes of the offsprings added to the archive
     """
     # Get list of ordered indexes according to selection strategy
     if self.params.selection_operator == 'random':
       idx = list(range(offsprings.size))
-      np.random.shuffle(idx)
+      random_streams.get_generator(self.entropy, random_streams.ARCHIVE_STREAM, self.generation).shuffle(idx)
     elif self.params.selection_operator == 'best':
       performances = offsprings[self.update_criteria]
       idx = np.argsort(performances)[::-1]  # Order idx according to performances. (From highest to lowest)
@@ -94,6 +103,7 @@ class BaseEvolver(object):
     # Add to archive the first lambda offsprings in the idx list
     for i in idx[:self.params._lambda]:
       self.archive.store(offsprings[i])
+    return idx[:self.params._lambda]
 
   def update_population(self, population, offsprings):
     """
@@ -102,9 +112,8 @@ class BaseEvolver(object):
     :param offsprings:
     :return:
     """
-    performances = population[self.update_criteria] + offsprings[self.update_criteria]
+    performances = np.concatenate([population[self.update_criteria], offsprings[self.update_criteria]])
     idx = np.argsort(performances)[::-1]  # Order idx according to performances.
-    parents_off = population.pop + offsprings.pop
-    # Update population list by going through it and putting an agent from parents+off at its place
-    for new_pop_idx, old_pop_idx in zip(range(population.size), idx[:population.size]):
-      population.pop[new_pop_idx] = parents_off[old_pop_idx]
\ No newline at end of file
+    # Keep the best agents among parents+off
+    population.select(idx[:population.size], offsprings)
+    self.generation += 1
\ No newline at end of file
@@ -0,0 +1,357 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+
+# Distance metrics that can be served by the KD-tree, with the corresponding Minkowski p
+KDTREE_METRICS = {'euclidean': 2,
+                  'manhattan': 1,
+                  'mink_1': 1}
+
+# Distance metrics that can be served by the LSH index, with the stable distribution from which its projections are drawn
+LSH_METRICS = {'euclidean': 'standard_normal',
+               'manhattan': 'standard_cauchy',
+               'mink_1': 'standard_cauchy'}
+
+
+class KDTreeIndex(object):
+  """
+  This class implements an incremental k-NN index over an append-only set of points (e.g. the BDs in the archive).
+  The points are kept in a KD-tree that is rebuilt only when the points added after the last build become more than
+  a fraction of the tree size. Until then the new points are kept in a small buffer that is searched by brute force.
+  This way the cost of the rebuilds is amortised over the additions.
+  """
+  def __init__(self, distance_metric='euclidean', rebuild_ratio=0.1, min_buffer=256, leafsize=16):
+    """
+    Constructor
+    :param distance_metric: Distance metric. Has to be one of KDTREE_METRICS
+    :param rebuild_ratio: The tree is rebuilt when the buffer is bigger than rebuild_ratio * tree size
+    :param min_buffer: Minimum size the buffer can reach before rebuilding the tree
+    :param leafsize: Leafsize of the KD-tree
+    """
+    if distance_metric not in KDTREE_METRICS:
+      raise ValueError('Distance {} not available for KD-tree. Available: {}'.format(distance_metric, list(KDTREE_METRICS.keys())))
+    self.distance_metric = distance_metric
+    self.p = KDTREE_METRICS[distance_metric]
+    self.rebuild_ratio = rebuild_ratio
+    self.min_buffer = min_buffer
+    self.leafsize = leafsize
+    self.reset()
+
+  def reset(self):
+    """
+    Empties the index
+    :return:
+    """
+    self._points = None
+    self._size = 0
+    self._tree = None
+    self._tree_size = 0
+
+  @property
+  def size(self):
+    """
+    Number of points in the index
+    """
+    return self._size
+
+  def __len__(self):
+    return self.size
+
+  def add(self, points):
+    """
+    Adds points to the index. The underlying storage grows by doubling.
+    :param points: Array of shape (n, dim)
+    :return:
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    if len(points) == 0:
+      return
+    if self._points is None:
+      self._points = np.empty((max(len(points), self.min_buffer), points.shape[1]))
+    elif self._size + len(points) > len(self._points):
+      new_points = np.empty((max(2 * len(self._points), self._size + len(points)), self._points.shape[1]))
+      new_points[:self._size] = self._points[:self._size]
+      self._points = new_points
+    self._points[self._size:self._size + len(points)] = points
+    self._size += len(points)
+
+    if self._size - self._tree_size > max(self.min_buffer, self.rebuild_ratio * self._tree_size):
+      self._rebuild()
+
+  def _rebuild(self):
+    """
+    Rebuilds the KD-tree on all the points in the index
+    :return:
+    """
+    self._tree = cKDTree(self._points[:self._size], leafsize=self.leafsize)
+    self._tree_size = self._size
+
+  def query(self, points, k):
+    """
+    Returns the distances of the k nearest neighbors of each of the given points, ordered from closest to farthest.
+    If the index contains less than k points, all of them are returned.
+    :param points: Array of shape (n, dim)
+    :param k: Number of neighbors
+    :return: Array of shape (n, min(k, size))
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    k = min(k, self._size)
+    if k == 0:
+      return np.empty((len(points), 0))
+
+    candidates = []
+    if self._tree_size > 0:
+      dist, _ = self._tree.query(points, k=min(k, self._tree_size), p=self.p)
+      candidates.append(np.reshape(dist, (len(points), -1)))
+    if self._size > self._tree_size:
+      metric = 'euclidean' if self.p == 2 else 'cityblock'
+      candidates.append(cdist(points, self._points[self._tree_size:self._size], metric=metric))
+
+    candidates = np.concatenate(candidates, axis=1)
+    if candidates.shape[1] > k:
+      candidates = np.partition(candidates, k - 1, axis=1)[:, :k]
+    return np.sort(candidates, axis=1)
+
+
+def _expand_ranges(starts, counts):
+  """
+  Expands the ranges [start, start + count) in a single array
+  :param starts: Array of starts of the ranges
+  :param counts: Array of lengths of the ranges
+  :return: (range of each element, elements)
+  """
+  ranges = np.repeat(np.arange(len(counts)), counts)
+  offsets = np.arange(np.sum(counts)) - np.repeat(np.cumsum(counts) - counts, counts)
+  return ranges, np.repeat(starts, counts) + offsets
+
+
+class LSHIndex(object):
+  """
+  This class implements an approximate k-NN index over an append-only set of points, based on random projections LSH
+  (E2LSH). Each of the tables hashes a point with a set of random projections quantised in buckets of width w:
+  h(x) = floor(a.x / w + b). The projections are drawn from the stable distribution of the metric (gaussian for
+  euclidean, cauchy for manhattan), so close points end up in the same bucket of a table with high probability.
+  A query gathers the points in its buckets of all the tables and calculates the exact distances only to them. With
+  more tables more candidates are found, so the recall is higher and the query slower. With more hashes per table the
+  buckets are smaller, so the query is faster and the recall lower.
+  Each table is kept as the keys of the points sorted, so the buckets of all the queries are found at once with a
+  binary search. The points added later are kept in a pending list, that is searched by sorting the query keys and is
+  merged in the tables when it is bigger than merge_ratio of the points in the tables.
+  The bucket widths are set from the spread of the projected points, and recalculated every time the index doubles.
+  Until the index reaches min_size points it is searched by brute force, so the results on small sets are exact.
+  """
+  def __init__(self, distance_metric='euclidean', tables=16, hashes=6, width=1., min_size=1024, merge_ratio=0.1,
+               max_block_elements=1 << 22, rng=None):
+    """
+    Constructor
+    :param distance_metric: Distance metric. Has to be one of LSH_METRICS
+    :param tables: Number of hash tables
+    :param hashes: Number of projections of each table
+    :param width: Width of the buckets, relative to the standard deviation of the projected points
+    :param min_size: Size from which the hash tables are used
+    :param merge_ratio: The pending points are merged in the tables when they are more than merge_ratio * tables size
+    :param max_block_elements: Max elements of the candidates differences calculated at once
+    :param rng: np.random.Generator from which the projections are drawn
+    """
+    if distance_metric not in LSH_METRICS:
+      raise ValueError('Distance {} not available for LSH. Available: {}'.format(distance_metric, list(LSH_METRICS.keys())))
+    self.distance_metric = distance_metric
+    self.metric = 'euclidean' if distance_metric == 'euclidean' else 'cityblock'
+    self.tables = tables
+    self.hashes = hashes
+    self.width = width
+    self.min_size = min_size
+    self.merge_ratio = merge_ratio
+    self.max_block_elements = max_block_elements
+    self.rng = np.random.default_rng() if rng is None else rng
+    self._projections = None
+    self.reset()
+
+  def reset(self):
+    """
+    Empties the index. The projections are kept
+    :return:
+    """
+    self._points = None
+    self._size = 0
+    self._built_size = 0
+    self._widths = None
+    self._sorted_keys = None # For each table, keys of the merged points sorted
+    self._order = None # For each table, merged points in the order of the sorted keys
+    self._merged_size = 0
+    self._pending_keys = [] # Keys of the points added after the last merge, as (tables, n) arrays
+
+  @property
+  def size(self):
+    """
+    Number of points in the index
+    """
+    return self._size
+
+  def __len__(self):
+    return self.size
+
+  def add(self, points):
+    """
+    Adds points to the index. The underlying storage grows by doubling.
+    :param points: Array of shape (n, dim)
+    :return:
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    if len(points) == 0:
+      return
+    if self._points is None:
+      self._points = np.empty((max(len(points), self.min_size), points.shape[1]))
+    elif self._size + len(points) > len(self._points):
+      new_points = np.empty((max(2 * len(self._points), self._size + len(points)), self._points.shape[1]))
+      new_points[:self._size] = self._points[:self._size]
+      self._points = new_points
+    self._points[self._size:self._size + len(points)] = points
+    self._size += len(points)
+
+    if self._size >= max(self.min_size, 2 * self._built_size):
+      self._rebuild()
+    elif self._sorted_keys is not None:
+      self._pending_keys.append(self._keys(points))
+      if self._size - self._merged_size > self.merge_ratio * self._merged_size:
+        self._merge()
+
+  def _keys(self, points):
+    """
+    Returns the key of the bucket of each point in each table
+    :param points: Array of shape (n, dim)
+    :return: Array of shape (tables, n)
+    """
+    keys = np.empty((self.tables, len(points)), dtype=np.int64)
+    for table in range(self.tables):
+      codes = np.floor(points @ self._projections[table] / self._widths[table] + self._offsets[table]).astype(np.int64)
+      keys[table] = codes @ self._mixers[table] # Overflows wrap around, which is fine for a hash
+    return keys
+
+  def _rebuild(self):
+    """
+    Recalculates the bucket widths from the points in the index and rebuilds the hash tables
+    :return:
+    """
+    points = self._points[:self._size]
+    if self._projections is None:
+      self._projections = getattr(self.rng, LSH_METRICS[self.distance_metric])(size=(self.tables, points.shape[1], self.hashes))
+      self._offsets = self.rng.random((self.tables, self.hashes))
+      self._mixers = self.rng.integers(1, 2 ** 62, size=(self.tables, self.hashes), dtype=np.int64)
+
+    self._widths = np.empty((self.tables, self.hashes))
+    for table in range(self.tables):
+      projected = points @ self._projections[table]
+      if self.distance_metric == 'euclidean':
+        spread = np.std(projected, axis=0)
+      else:
+        # The cauchy projections have heavy tails, so the interquartile range is used
+        spread = np.subtract(*np.percentile(projected, [75, 25], axis=0))
+      self._widths[table] = self.width * np.maximum(spread, 1e-12)
+
+    self._sorted_keys, self._order = None, None
+    self._merged_size = 0
+    self._pending_keys = [self._keys(points)]
+    self._merge()
+    self._built_size = self._size
+
+  def _merge(self):
+    """
+    Merges the pending points in the sorted tables
+    :return:
+    """
+    keys = np.concatenate(self._pending_keys, axis=1)
+    points = np.arange(self._merged_size, self._merged_size + keys.shape[1])
+    if self._sorted_keys is not None:
+      keys = np.concatenate([self._sorted_keys, keys], axis=1)
+      points = np.concatenate([self._order, np.broadcast_to(points, (self.tables, len(points)))], axis=1)
+    else:
+      points = np.broadcast_to(points, keys.shape)
+    order = np.argsort(keys, axis=1, kind='stable')
+    self._sorted_keys = np.take_along_axis(keys, order, axis=1)
+    self._order = np.take_along_axis(points, order, axis=1)
+    self._merged_size = self._size
+    self._pending_keys = []
+
+  def _candidates(self, keys):
+    """
+    Returns the pairs (query, point) of the queries and the points that share a bucket in at least a table
+    :param keys: Keys of the queries, as returned by _keys
+    :return: (queries, points) arrays. The pairs are unique and sorted by query
+    """
+    queries, points = [], []
+    pending = np.concatenate(self._pending_keys, axis=1) if self._pending_keys else None
+    for table in range(self.tables):
+      # Buckets of the queries in the sorted table
+      left = np.searchsorted(self._sorted_keys[table], keys[table], side='left')
+      right = np.searchsorted(self._sorted_keys[table], keys[table], side='right')
+      query, position = _expand_ranges(left, right - left)
+      queries.append(query)
+      points.append(self._order[table][position])
+
+      if pending is not None:
+        # Pending points are few, so the queries are sorted and the pending points are looked up in them
+        query_order = np.argsort(keys[table], kind='stable')
+        sorted_queries = keys[table][query_order]
+        left = np.searchsorted(sorted_queries, pending[table], side='left')
+        right = np.searchsorted(sorted_queries, pending[table], side='right')
+        point, position = _expand_ranges(left, right - left)
+        queries.append(query_order[position])
+        points.append(point + self._merged_size)
+
+    pairs = np.unique(np.concatenate(queries) * self._size + np.concatenate(points))
+    return pairs // self._size, pairs % self._size
+
+  def _pair_distances(self, points, queries, candidates):
+    """
+    Calculates the distances of the pairs of queries and candidates, by blocks
+    :param points: Query points
+    :param queries: Query of each pair
+    :param candidates: Index point of each pair
+    :return: array of distances
+    """
+    distances = np.empty(len(queries))
+    block = max(self.max_block_elements // points.shape[1], 1)
+    for start in range(0, len(queries), block):
+      differences = points[queries[start:start + block]] - self._points[candidates[start:start + block]]
+      if self.metric == 'euclidean':
+        distances[start:start + block] = np.sqrt(np.einsum('ij,ij->i', differences, differences))
+      else:
+        distances[start:start + block] = np.sum(np.abs(differences), axis=1)
+    return distances
+
+  def query(self, points, k):
+    """
+    Returns the distances of the approximate k nearest neighbors of each of the given points, ordered from closest to
+    farthest. The points for which the buckets contain less than k points are searched by brute force.
+    If the index contains less than k points, all of them are returned.
+    :param points: Array of shape (n, dim)
+    :param k: Number of neighbors
+    :return: Array of shape (n, min(k, size))
+    """
+    points = np.atleast_2d(np.asarray(points, dtype=np.float64))
+    k = min(k, self._size)
+    if k == 0:
+      return np.empty((len(points), 0))
+
+    if self._sorted_keys is None:
+      distances = cdist(points, self._points[:self._size], metric=self.metric)
+      return np.sort(np.partition(distances, k - 1, axis=1)[:, :k], axis=1)
+
+    queries, candidates = self._candidates(self._keys(points))
+    distances = self._pair_distances(points, queries, candidates)
+    order = np.lexsort((distances, queries)) # By query and then by distance
+    counts = np.bincount(queries, minlength=len(points))
+    starts = np.cumsum(counts) - counts
+
+    nearest = np.empty((len(points), k))
+    found = counts >= k
+    _, position = _expand_ranges(starts[found], np.full(np.count_nonzero(found), k))
+    nearest[found] = distances[order[position]].reshape(-1, k)
+    if not np.all(found):
+      distances = cdist(points[~found], self._points[:self._size], metric=self.metric)
+      nearest[~found] = np.sort(np.partition(distances, k - 1, axis=1)[:, :k], axis=1)
+    return nearest
@@ -1,8 +1,12 @@
 # Created by Giuseppe Paolo 
 # Date: 09/03/2020
 
+import numpy as np
 from core.evolvers import BaseEvolver
 from core.evolvers import utils
+from core.evolvers.knn_index import KDTreeIndex, KDTREE_METRICS, LSHIndex, LSH_METRICS
+from core.evolvers.whitening import RunningWhitening
+from core import random_streams
 
 
 class NoveltySearch(BaseEvolver):
@@ -13,34 +17,190 @@ class NoveltySearch(BaseEvolver):
     super().__init__(parameters)
     self.update_criteria = 'novelty'
 
+    # With the whitened mahalanobis distance the BDs are whitened with the running covariance of the archive, so that
+    # the euclidean distance, and its indexes, can be used
+    self.distance_metric = self.params.novelty_distance_metric
+    self.whitening = None
+    if self.distance_metric == 'mahalanobis' and self.params.novelty_whitening:
+      self.whitening = RunningWhitening(refresh_ratio=self.params.novelty_whitening_refresh)
+      self.distance_metric = 'euclidean'
+
+    # The archive part of the reference set is kept in a k-NN index that is updated every time agents are stored
+    # The backends that do not support the distance metric fall back to brute force
+    if self.params.novelty_backend not in ['brute', 'kdtree', 'lsh']:
+      raise ValueError('Specified novelty backend {} not available. Valid: ["brute", "kdtree", "lsh"]'.format(self.params.novelty_backend))
+    if self.params.novelty_backend == 'kdtree' and self.distance_metric in KDTREE_METRICS:
+      self.archive_index = KDTreeIndex(distance_metric=self.distance_metric)
+    elif self.params.novelty_backend == 'lsh' and self.distance_metric in LSH_METRICS:
+      # Approximate: the novelty of agents far from the others might be slightly overestimated
+      self.archive_index = LSHIndex(distance_metric=self.distance_metric,
+                                    tables=self.params.novelty_lsh_tables, hashes=self.params.novelty_lsh_hashes,
+                                    rng=random_streams.get_generator(self.entropy, random_streams.LSH_STREAM))
+    else:
+      if self.params.novelty_backend != 'brute':
+        print('Novelty backend {} not available with distance {}. Using brute force.'.format(self.params.novelty_backend, self.distance_metric))
+      self.archive_index = None
+
+    # For each agent of the last evaluated population and offsprings, the archive size at which its nearest archive
+    # distances were calculated, its BD and the distances. The not whitened mahalanobis distances depend on the sets they
+    # are calculated on, so they cannot be reused.
+    self.archive_neighbors = {}
+    self.use_neighbors_cache = self.params.novelty_neighbors_cache and self.distance_metric != 'mahalanobis'
+
+  def _whiten(self, points):
+    """
+    Whitens the BDs when the whitened mahalanobis distance is used. Otherwise returns them as they are
+    :param points: Matrix of BDs
+    :return:
+    """
+    if self.whitening is None or not self.whitening.ready:
+      return points
+    return self.whitening.transform(points)
+
+  def _update_whitening(self):
+    """
+    Starts using the new whitening transform, if one has been calculated. When the transform changes, the whitened BDs
+    in the index and in the cache are not valid anymore, so they are dropped.
+    :return:
+    """
+    if self.whitening.refresh():
+      self.archive_neighbors = {}
+      if self.archive_index is not None:
+        self.archive_index.reset()
+
+  def reset_archive_caches(self):
+    """
+    Drops everything calculated from the archive. Needed when the archive is replaced (e.g. when it is loaded)
+    :return:
+    """
+    self.archive_neighbors = {}
+    if self.archive_index is not None:
+      self.archive_index.reset()
+    if self.whitening is not None:
+      self.whitening.reset()
+      if self.archive.size > 0:
+        self.whitening.update(self.archive['bd'])
+
+  def _sync_index(self):
+    """
+    Makes sure the index contains the whole archive. This is needed if the archive has been modified without passing
+    through update_archive (e.g. when it is loaded)
+    :return:
+    """
+    if self.archive_index.size != self.archive.size:
+      self.archive_index.reset()
+      if self.archive.size > 0:
+        self.archive_index.add(self._whiten(self.archive['bd']))
+
+  def _archive_neighbors(self, bd_set, ids):
+    """
+    Returns the distances of the novelty_neighs + 1 nearest archive agents of each BD.
+    The archive is append-only, so for the agents in the cache (same id and BD) only the distances to the archive agents
+    added after the last calculation are calculated and merged with the cached ones. The cache is then restricted to the given agents.
+    :param bd_set:
+    :param ids: ids of the agents the BDs belong to
+    :return: array of shape (len(bd_set), min(novelty_neighs + 1, archive size))
+    """
+    k = self.params.novelty_neighs + 1
+    archive_size = self.archive.size
+    neighbors = [None] * len(bd_set)
+
+    # Cached agents are grouped by the archive size they were updated at, so the distances are calculated by blocks
+    missing, deltas = [], {}
+    for i, agent_id in enumerate(ids):
+      if agent_id in self.archive_neighbors and np.array_equal(self.archive_neighbors[agent_id][1], bd_set[i]):
+        deltas.setdefault(self.archive_neighbors[agent_id][0], []).append(i)
+      else:
+        missing.append(i)
+
+    for size in deltas:
+      idx = deltas[size]
+      cached = np.stack([self.archive_neighbors[ids[i]][2] for i in idx])
+      if size < archive_size:
+        new = utils.calculate_distances(bd_set[idx], self._whiten(self.archive['bd'][size:]), distance_metric=self.distance_metric)
+        cached = np.concatenate([cached, new], axis=1)
+        if cached.shape[1] > k:
+          cached = np.partition(cached, k - 1, axis=1)[:, :k]
+        cached = np.sort(cached, axis=1)
+      for row, i in enumerate(idx):
+        neighbors[i] = cached[row]
+
+    if missing:
+      if self.archive_index is not None:
+        self._sync_index()
+        nearest = self.archive_index.query(bd_set[missing], k)
+      else:
+        nearest = utils.calculate_nearest_distances(bd_set[missing], self._whiten(self.archive['bd']), k,
+                                                    distance_metric=self.distance_metric,
+                                                    threads=self.params.novelty_threads)
+      for row, i in enumerate(missing):
+        neighbors[i] = nearest[row]
+
+    self.archive_neighbors = {agent_id: (archive_size, bd_set[i], neighbors[i]) for i, agent_id in enumerate(ids)}
+    return np.stack(neighbors)
+
+  def calculate_novelties(self, bd_set, ids):
+    """
+    This function calculates the novelty of the BDs wrt the BDs themselves plus the archive, according to the backend.
+    :param bd_set: Matrix of BDs
+    :param ids: ids of the agents the BDs belong to
+    :return: list of novelties
+    """
+    if self.whitening is not None:
+      self._update_whitening()
+      bd_set = self._whiten(bd_set)
+
+    if self.use_neighbors_cache:
+      neighbors = self._archive_neighbors(bd_set, ids) if self.archive.size > 0 else None
+      return utils.calculate_novelties_with_neighbors(bd_set, neighbors,
+                                                      distance_metric=self.distance_metric,
+                                                      novelty_neighs=self.params.novelty_neighs,
+                                                      threads=self.params.novelty_threads)
+    elif self.archive_index is not None:
+      self._sync_index()
+      return utils.calculate_novelties_indexed(bd_set, self.archive_index,
+                                               distance_metric=self.distance_metric,
+                                               novelty_neighs=self.params.novelty_neighs,
+                                               threads=self.params.novelty_threads)
+    else:
+      reference_set = bd_set
+      if self.archive.size > 0:
+        reference_set = np.concatenate([reference_set, self._whiten(self.archive['bd'])]) # The archive BDs are a single matrix
+      return utils.calculate_novelties(bd_set, reference_set, distance_metric=self.distance_metric,
+                                       novelty_neighs=self.params.novelty_neighs, threads=self.params.novelty_threads)
+
   def evaluate_performances(self, population, offsprings, pool=None):
     """
     This function evaluates the novelty of population and offsprings wrt pop+off+archive reference set.
     The novelty is evaluated according to the given distance metric
     :param population:
     :param offsprings:
-    :param pool: Multiprocessing pool
+    :param pool: Multiprocessing pool. Not used: the novelty is calculated by params.novelty_threads threads
     :return:
     """
     # Get BSs
     population_bd = population['bd']
     offsprings_bd = offsprings['bd']
+    bd_set = np.concatenate([np.stack(population_bd), np.stack(offsprings_bd)])
+    ids = list(population['id']) + list(offsprings['id'])
 
-    if self.archive.size > 0:
-      archive_bd = self.archive['bd']
-    else:
-      archive_bd = []
-
-    reference_set = population_bd + offsprings_bd + archive_bd
-    bd_set = population_bd + offsprings_bd
-
-    novelties = utils.calculate_novelties(bd_set, reference_set, distance_metric=self.params.novelty_distance_metric,
-                                          novelty_neighs=self.params.novelty_neighs, pool=pool)
+    novelties = self.calculate_novelties(bd_set, ids)
     # Update population and offsprings
     population['novelty'] = novelties[:population.size]
     offsprings['novelty'] = novelties[population.size:]
 
-
-
-
-
+  def update_archive(self, offsprings):
+    """
+    Updates the archive and adds the BDs of the newly stored agents to the index and to the whitening statistics
+    :param offsprings:
+    :return: list of indexes of the offsprings added to the archive
+    """
+    stored = super().update_archive(offsprings)
+    if len(stored) == 0:
+      return stored
+    stored_bd = np.array([offsprings[i]['bd'] for i in stored])
+    if self.whitening is not None:
+      self.whitening.update(stored_bd)
+    if self.archive_index is not None and self.archive_index.size + len(stored) == self.archive.size:
+      self.archive_index.add(self._whiten(stored_bd))
+    return stored
@@ -0,0 +1,98 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+from core.evolvers import NoveltySearch
+from core.evolvers import utils
+from core import random_streams
+
+
+class SteadyStateNoveltySearch(NoveltySearch):
+  """
+  This class implements steady-state NS. There are no generations of offsprings evaluated together: an offspring is
+  generated every time an evaluation slot frees up, and as soon as it is evaluated its novelty is calculated wrt the
+  current population and archive. If it is more novel than the least novel agent of the population, it takes its place.
+  The archive is updated every epoch, that is every pop_size * offsprings_per_parent evaluated offsprings, with the
+  offsprings of the epoch. At the same time the novelty of the population is recalculated, given that the archive changed.
+  """
+  def __init__(self, parameters):
+    super().__init__(parameters)
+    self.epoch_size = self.params.pop_size * self.params.offsprings_per_parent
+
+  def generate_agent(self, population):
+    """
+    Generates an offspring by mutating a parent sampled from the population.
+    Parent and mutation are drawn from the stream of the offspring id, so they do not depend on the process.
+    :param population:
+    :return: offspring agent dict
+    """
+    rng = random_streams.get_generator(self.entropy, random_streams.STEADY_STATE_STREAM, population.agent_id)
+    parent = population[int(rng.integers(population.size))]
+    noise = getattr(rng, self.mutation_operator)(self.mu, self.sigma, np.shape(parent['genome']))
+
+    agent = self.agent_template.copy()
+    agent['genome'] = np.clip(parent['genome'] + noise, self.params.genome_limit[0], self.params.genome_limit[1])
+    agent['parent'] = parent['id']
+    agent['id'] = population.agent_id
+    population.agent_id += 1
+    return agent
+
+  def calculate_novelty(self, bd, population):
+    """
+    Calculates the novelty of a BD wrt the reference set given by the population and the archive.
+    The BD is not part of the reference set, so all the k nearest neighbors are used.
+    :param bd:
+    :param population:
+    :return: novelty
+    """
+    bd = self._whiten(np.atleast_2d(bd))
+    population_bd = self._whiten(np.stack(population['bd']))
+    if self.archive_index is not None:
+      self._sync_index()
+      candidates = utils.calculate_distances(bd, population_bd, distance_metric=self.distance_metric)
+      if self.archive_index.size > 0:
+        candidates = np.concatenate([candidates, self.archive_index.query(bd, self.params.novelty_neighs)], axis=1)
+    else:
+      reference_set = population_bd
+      if self.archive.size > 0:
+        reference_set = np.concatenate([reference_set, self._whiten(self.archive['bd'])])
+      candidates = utils.calculate_distances(bd, reference_set, distance_metric=self.distance_metric)
+
+    k = min(self.params.novelty_neighs, candidates.shape[1])
+    return np.mean(np.partition(candidates[0], k - 1)[:k])
+
+  def update_novelties(self, population):
+    """
+    Recalculates the novelty of the population wrt population+archive
+    :param population:
+    :return:
+    """
+    population['novelty'] = self.calculate_novelties(np.stack(population['bd']), list(population['id']))
+
+  def insert(self, population, agent):
+    """
+    Calculates the novelty of the evaluated agent and puts it in place of the least novel agent of the population, if
+    it is more novel.
+    :param population:
+    :param agent: Evaluated agent dict. Its novelty is set
+    :return: True if the agent entered the population
+    """
+    agent['novelty'] = self.calculate_novelty(agent['bd'], population)
+    novelties = np.asarray(population['novelty'], dtype=np.float64)
+    worst = int(np.argmin(novelties))
+    if agent['novelty'] > novelties[worst]:
+      population[worst] = agent.copy() # So that the novelty updates of the population do not change the offsprings
+      return True
+    return False
+
+  def end_epoch(self, population, offsprings):
+    """
+    Closes the epoch: updates the archive with the offsprings evaluated during the epoch and the novelty of the population
+    :param population:
+    :param offsprings: Population with the offsprings evaluated during the epoch
+    :return: list of indexes of the offsprings added to the archive
+    """
+    stored = self.update_archive(offsprings)
+    self.update_novelties(population)
+    self.generation += 1
+    return stored
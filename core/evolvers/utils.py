@@ -2,10 +2,13 @@
 # Date: 06/03/2020
 
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from scipy.spatial.distance import squareform, cdist
 import matplotlib.pyplot as plt
 plt.style.use('seaborn')
 
+MAX_BLOCK_ELEMENTS = 1 << 22 # Max elements of the distance matrix allocated at once by each thread (32MB of float64)
+
 
 
 def novelty(distances, neighs):
@@ -19,36 +22,131 @@ def novelty(distances, neighs):
   mean_k_dist = np.mean(distances[idx[1:neighs + 1]])  # the 1:+1 is necessary cause the position 0 is occupied by the index of the considered element
   return mean_k_dist
 
-def calculate_novelties(bd_set, reference_set, distance_metric='euclidean', novelty_neighs=15, pool=None):
+def _block_nearest(bd_block, reference_set, distance_metric, k, VI=None):
+  """
+  Calculates the distances of the k nearest elements of the reference set for a block of rows of the BD set.
+  Only the distance matrix of the block is allocated.
+  :param bd_block:
+  :param reference_set:
+  :param distance_metric:
+  :param k:
+  :param VI: Inverse covariance for the mahalanobis distance
+  :return: array of shape (block size, min(k, reference size)) ordered from closest to farthest
+  """
+  distances = calculate_distances(bd_block, reference_set, distance_metric=distance_metric, VI=VI)
+  k = min(k, distances.shape[1])
+  return np.sort(np.partition(distances, k - 1, axis=1)[:, :k], axis=1)
+
+def calculate_nearest_distances(bd_set, reference_set, k, distance_metric='euclidean', threads=1, max_block_elements=MAX_BLOCK_ELEMENTS):
   """
-  This function calculates the novelty for each element in the BD set wrt the Reference set
+  This function calculates, for each element in the BD set, the distances of its k nearest elements in the reference set.
+  The BD set is split in blocks of rows, so that the distance matrix of a block has at most max_block_elements elements
+  and the whole distance matrix is never allocated. The blocks are processed by a pool of threads: the distance
+  calculation and the partition release the GIL, so the threads run in parallel.
+  :param bd_set:
+  :param reference_set:
+  :param k: Number of neighbors
+  :param distance_metric: Distance metric. Default: euclidean
+  :param threads: Number of threads processing the blocks. Default: 1
+  :param max_block_elements: Max number of elements of the distance matrix of a block
+  :return: array of shape (len(bd_set), min(k, len(reference_set))) ordered from closest to farthest
+  """
+  bd_set = np.asarray(bd_set)
+  reference_set = np.asarray(reference_set)
+  if len(bd_set) == 0 or len(reference_set) == 0:
+    return np.empty((len(bd_set), 0))
+  # The mahalanobis covariance is the one of the whole sets, as in a single cdist call, so it does not depend on the blocks
+  VI = mahalanobis_vi(bd_set, reference_set) if distance_metric == 'mahalanobis' else None
+  threads = max(threads, 1)
+  block_size = max(min(max_block_elements // len(reference_set), int(np.ceil(len(bd_set) / threads))), 1)
+  blocks = [bd_set[start:start + block_size] for start in range(0, len(bd_set), block_size)]
+
+  if threads > 1 and len(blocks) > 1:
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+      nearest = list(executor.map(lambda block: _block_nearest(block, reference_set, distance_metric, k, VI), blocks))
+  else:
+    nearest = [_block_nearest(block, reference_set, distance_metric, k, VI) for block in blocks]
+  return np.concatenate(nearest)
+
+def calculate_novelties(bd_set, reference_set, distance_metric='euclidean', novelty_neighs=15, threads=1, max_block_elements=MAX_BLOCK_ELEMENTS):
+  """
+  This function calculates the novelty for each element in the BD set wrt the Reference set.
+  The nearest neighbors are found by blocks of rows, as in calculate_nearest_distances.
   :param bd_set:
   :param reference_set:
   :param distance_metric: Distance metric with which the novelty is calculated. Default: euclidean
   :param novelty_neighs: Number of neighbors used for novelty calculation. Default: 15
-  :param pool: Pool for multiprocessing
+  :param threads: Number of threads processing the blocks. Default: 1
+  :param max_block_elements: Max number of elements of the distance matrix of a block
   :return:
   """
-  distance_matrix = calculate_distances(bd_set, reference_set, distance_metric=distance_metric)
-  if pool is not None:
-    novelties = [pool.apply(novelty, args=(distance, novelty_neighs,)) for distance in distance_matrix]
-  else:
-    novelties = [novelty(distance, novelty_neighs) for distance in distance_matrix]
-  return novelties
+  nearest = calculate_nearest_distances(bd_set, reference_set, novelty_neighs + 1, distance_metric=distance_metric,
+                                        threads=threads, max_block_elements=max_block_elements)
+  return list(np.mean(nearest[:, 1:], axis=1)) # Position 0 is occupied by the distance of the element from itself
+
+def calculate_novelties_indexed(bd_set, index, distance_metric='euclidean', novelty_neighs=15, threads=1, max_block_elements=MAX_BLOCK_ELEMENTS):
+  """
+  This function calculates the novelty for each element in the BD set wrt the BD set itself plus the points in the index.
+  The distances to the BD set are calculated by blocks, while the ones to the index are obtained with a k-nearest query.
+  This gives the same result as calculate_novelties with reference_set = bd_set + index points.
+  :param bd_set:
+  :param index: k-NN index containing the rest of the reference set (e.g. the archive)
+  :param distance_metric: Distance metric with which the novelty is calculated. Default: euclidean
+  :param novelty_neighs: Number of neighbors used for novelty calculation. Default: 15
+  :param threads: Number of threads processing the blocks of the BD set. Default: 1
+  :param max_block_elements: Max number of elements of the distance matrix of a block
+  :return:
+  """
+  neighbors = index.query(bd_set, novelty_neighs + 1) if index.size > 0 else None
+  return calculate_novelties_with_neighbors(bd_set, neighbors, distance_metric=distance_metric, novelty_neighs=novelty_neighs,
+                                            threads=threads, max_block_elements=max_block_elements)
+
+def calculate_novelties_with_neighbors(bd_set, neighbors, distance_metric='euclidean', novelty_neighs=15, threads=1, max_block_elements=MAX_BLOCK_ELEMENTS):
+  """
+  This function calculates the novelty for each element in the BD set wrt the BD set itself plus a set of points of
+  which only the distances of the novelty_neighs + 1 nearest ones are given (e.g. the archive).
+  The nearest elements of the BD set are found by blocks of rows, as in calculate_nearest_distances, and merged with
+  the given ones.
+  :param bd_set:
+  :param neighbors: array with a row for each element of the BD set with the distances of its nearest points. Can be None
+  :param distance_metric: Distance metric with which the novelty is calculated. Default: euclidean
+  :param novelty_neighs: Number of neighbors used for novelty calculation. Default: 15
+  :param threads: Number of threads processing the blocks of the BD set. Default: 1
+  :param max_block_elements: Max number of elements of the distance matrix of a block
+  :return:
+  """
+  candidates = calculate_nearest_distances(bd_set, bd_set, novelty_neighs + 1, distance_metric=distance_metric,
+                                           threads=threads, max_block_elements=max_block_elements)
+  if neighbors is not None:
+    candidates = np.concatenate([candidates, neighbors], axis=1)
+
+  k = min(novelty_neighs + 1, candidates.shape[1])
+  candidates = np.sort(np.partition(candidates, k - 1, axis=1)[:, :k], axis=1)
+  return list(np.mean(candidates[:, 1:], axis=1)) # Position 0 is occupied by the distance of the element from itself
+
+def mahalanobis_vi(bd_set, reference_set):
+  """
+  Returns the inverse covariance used by cdist for the mahalanobis distance between the sets when VI is not given
+  :param bd_set:
+  :param reference_set:
+  :return:
+  """
+  return np.linalg.inv(np.cov(np.vstack([bd_set, reference_set]).T)).T
 
-def calculate_distances(bd_set, reference_set, distance_metric='euclidean'):
+def calculate_distances(bd_set, reference_set, distance_metric='euclidean', VI=None):
   """
   This function is used to calculate the distances between the sets
   :param bd_set:
   :param reference_set:
   :param distance_metric: Distance metric to use. Default: euclidean
+  :param VI: Inverse covariance for the mahalanobis distance. If None, it is calculated from the two sets
   :return:
   """
   if distance_metric == 'euclidean':
     # TODO this operation might become slower when the archive grows. Might have to parallelize as well by doing it myself
     distance_matrix = cdist(bd_set, reference_set, metric='euclidean')
   elif distance_metric == 'mahalanobis':
-    distance_matrix = cdist(bd_set, reference_set, metric='mahalanobis')
+    distance_matrix = cdist(bd_set, reference_set, metric='mahalanobis', VI=VI)
   elif distance_metric == 'manhattan':
     distance_matrix = cdist(bd_set, reference_set, metric='cityblock')
   elif distance_metric == 'mink_0.1':
@@ -0,0 +1,121 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+from scipy.linalg import cholesky, solve_triangular
+
+
+class RunningWhitening(object):
+  """
+  This class keeps the running mean and covariance of a set of points (e.g. the BDs in the archive) and the whitening
+  transform given by the Cholesky factor of the covariance: x' = L^-1 (x - mean), with cov = L L^T.
+  The euclidean distance between whitened points is the mahalanobis distance between the original ones, so the
+  mahalanobis k-NN can be served by the euclidean indexes.
+  The statistics are updated at every addition in O(n dim^2), while the transform is calculated only when the number of
+  points reaches one of the refresh sizes: dim + 1 and then every time it grows by refresh_ratio. The transform is
+  calculated on the points up to the refresh size, so it depends only on the points and not on how they were added
+  (e.g. it is the same after loading the archive). The new transform is used only after calling refresh, so the whitened
+  points already calculated stay valid until then. Until the first refresh size is reached the points are not whitened.
+  """
+  def __init__(self, refresh_ratio=0.1, regularization=1e-6):
+    """
+    Constructor
+    :param refresh_ratio: The transform is recalculated when the points grow by this fraction since the last refresh
+    :param regularization: Added to the diagonal of the covariance, relative to its mean variance, so that the Cholesky
+    factorization works also with constant dimensions
+    """
+    self.refresh_ratio = refresh_ratio
+    self.regularization = regularization
+    self.reset()
+
+  def reset(self):
+    """
+    Forgets the points and the transform
+    :return:
+    """
+    self.count = 0
+    self.mean = None
+    self.scatter = None # Sum of the outer products of the deviations from the mean
+    self.next_refresh = None
+    self.pending = None # Transform calculated at the last refresh size, not used yet
+    self.center = None
+    self.transform_matrix = None
+
+  def _merge(self, points):
+    """
+    Merges mean and scatter of the points with the ones kept (Chan et al.)
+    :param points: Array of shape (n, dim)
+    :return:
+    """
+    mean = np.mean(points, axis=0)
+    deviations = points - mean
+    scatter = deviations.T @ deviations
+    if self.count == 0:
+      self.mean, self.scatter = mean, scatter
+    else:
+      count = self.count + len(points)
+      delta = mean - self.mean
+      self.mean = self.mean + delta * len(points) / count
+      self.scatter = self.scatter + scatter + np.outer(delta, delta) * self.count * len(points) / count
+    self.count += len(points)
+
+  def update(self, points):
+    """
+    Adds the points to the running statistics. The points are merged up to the next refresh size, at which the
+    transform is calculated, and then the rest.
+    :param points: Array of shape (n, dim)
+    :return:
+    """
+    points = np.asarray(points, dtype=np.float64)
+    if self.next_refresh is None and len(points) > 0:
+      self.next_refresh = points.shape[1] + 1
+    while len(points) > 0:
+      merged = min(len(points), self.next_refresh - self.count)
+      self._merge(points[:merged])
+      points = points[merged:]
+      if self.count == self.next_refresh:
+        self.pending = self._calculate_transform()
+        self.next_refresh = max(self.count + 1, int(np.ceil(self.count * (1 + self.refresh_ratio))))
+
+  @property
+  def covariance(self):
+    """
+    Covariance of the points, with the same normalization of np.cov
+    """
+    return self.scatter / (self.count - 1)
+
+  def _calculate_transform(self):
+    """
+    Calculates the transform from the current statistics
+    :return: (center, transform matrix)
+    """
+    covariance = self.covariance
+    covariance = covariance + np.eye(len(covariance)) * self.regularization * max(np.mean(np.diag(covariance)), 1e-12)
+    factor = cholesky(covariance, lower=True)
+    return self.mean.copy(), solve_triangular(factor, np.eye(len(factor)), lower=True).T # Row points: (x - mean) L^-T
+
+  def refresh(self):
+    """
+    Starts using the transform calculated at the last refresh size, if there is a new one
+    :return: True if the transform changed
+    """
+    if self.pending is None:
+      return False
+    self.center, self.transform_matrix = self.pending
+    self.pending = None
+    return True
+
+  @property
+  def ready(self):
+    """
+    True if the transform has been calculated
+    """
+    return self.transform_matrix is not None
+
+  def transform(self, points):
+    """
+    Whitens the points
+    :param points: Array of shape (n, dim)
+    :return: whitened points
+    """
+    return (np.asarray(points, dtype=np.float64) - self.center) @ self.transform_matrix
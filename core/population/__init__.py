@@ -1,4 +1,20 @@
 # Created by Giuseppe Paolo 
 # Date: 27/07/2020
 from core.population.population import Population
-from core.population.archive import Archive
\ No newline at end of file
+from core.population.array_population import ArrayPopulation
+from core.population.archive import Archive
+
+population_layouts = {'dict': Population,
+                      'array': ArrayPopulation}
+
+def make_population(parameters, init_size=None, name='population'):
+  """
+  Creates a population with the layout given in the parameters
+  :param parameters:
+  :param init_size:
+  :param name:
+  :return:
+  """
+  if parameters.population_layout not in population_layouts:
+    raise ValueError('Specified population layout {} not available. Valid: {}'.format(parameters.population_layout, list(population_layouts.keys())))
+  return population_layouts[parameters.population_layout](parameters, init_size=init_size, name=name)
\ No newline at end of file
@@ -4,19 +4,31 @@
 import os
 import pickle as pkl
 import numpy as np
-from collections import deque
+from core.population.archive_log import ArchiveLog
+from core.population.snapshot import save_snapshot, load_snapshot
 
 class Archive(object):
   """
-  This class implements the archive. It only stores the BD and traj of each agent in unordered sets.
-  We do not need to know anything else nor we need an order.
+  This class implements the archive. It only stores the info listed in archive_stored_info for each agent.
+  The data is stored column wise: each info is kept in a contiguous array whose first dimension is the archive
+  capacity, and that doubles in size when full. This way a column can be returned as a view without copying.
   """
   # ---------------------------------
-  def __init__(self, parameters):
-    self.data = deque() # This contains tuples with (agent_id, gt_bd bd, traj). The agent_id is necessary in case there are same bd-traj
-    # self.data = set() # If wanna use set
+  def __init__(self, parameters, capacity=1024):
     self.params = parameters
     self.stored_info = self.params.archive_stored_info # Stuff is stored according to this order
+    self.init_capacity = capacity
+    self.archive_log = None
+    self.reset()
+
+  def reset(self):
+    """
+    Empties the archive
+    :return:
+    """
+    self.data = {info: None for info in self.stored_info} # Columns are allocated at the first store
+    self.capacity = self.init_capacity
+    self._size = 0
   # ---------------------------------
 
   # ---------------------------------
@@ -28,39 +40,106 @@ class Archive(object):
 
   def __iter__(self):
     """
-    Allows to directly iterate the pop.
-    :return:
-    """
-    return self.data.__iter__()
-
-  def __next__(self):
-    """
-    During iteration returns the next element of the iterator
+    Allows to directly iterate the archive. Each element is a list ordered as stored_info.
     :return:
     """
-    return self.data.__next__()
+    return (self[idx] for idx in range(self.size))
 
   def __getitem__(self, item):
     """
     Returns the asked item
-    :param item: item to return. Can be an agent or a key
-    :return: returns the corresponding agent or the column of the dict
+    :param item: item to return. Can be an index or a key
+    :return: returns the list of stored infos of the corresponding agent or the column of the archive as an array view
     """
     if type(item) == str:
-      try:
-        index = self.stored_info.index(item) # Get index of item to get
-        return [np.array(x[index]) for x in self.data] # Return list of those items
-      except ValueError:
+      if item not in self.stored_info:
         raise ValueError('Wrong key given. Available: {} - Given: {}'.format(self.stored_info, item))
+      if self.data[item] is None:
+        return np.empty(0)
+      return self.data[item][:self.size]
     else:
-      return self.data[item]
+      if not self.size > item > -self.size - 1:
+        raise IndexError('Archive index out of range')
+      item = item % self.size
+      return [self.data[info][item] for info in self.stored_info]
 
   @property
   def size(self):
     """
     Size of the archive
     """
-    return len(self.data)
+    return self._size
+  # ---------------------------------
+
+  # ---------------------------------
+  def _new_column(self, value):
+    """
+    Allocates an empty column able to contain elements like value.
+    If the value is not numerical, the column is an object array.
+    :param value:
+    :return:
+    """
+    value = np.asarray(value) if value is not None else np.empty(0, dtype=object)
+    if value.dtype == object:
+      return np.empty(self.capacity, dtype=object)
+    return np.empty((self.capacity,) + value.shape, dtype=value.dtype)
+
+  def _to_object(self, info):
+    """
+    Converts a column to an object array. This happens when a value that does not fit the column is stored.
+    :param info:
+    :return:
+    """
+    column = np.empty(self.capacity, dtype=object)
+    for idx in range(self.size):
+      column[idx] = self.data[info][idx]
+    self.data[info] = column
+
+  def _grow(self, needed):
+    """
+    Doubles the capacity of the columns until needed elements fit
+    :param needed:
+    :return:
+    """
+    while self.capacity < needed:
+      self.capacity *= 2
+    for info in self.stored_info:
+      if self.data[info] is not None and len(self.data[info]) < self.capacity:
+        column = np.empty((self.capacity,) + self.data[info].shape[1:], dtype=self.data[info].dtype)
+        column[:self.size] = self.data[info][:self.size]
+        self.data[info] = column
+
+  def _write(self, info, idx, value):
+    """
+    Writes the value in position idx of the info column
+    :param info:
+    :param idx:
+    :param value:
+    :return:
+    """
+    if self.data[info] is None:
+      self.data[info] = self._new_column(value)
+    column = self.data[info]
+    if column.dtype != object and (value is None or np.shape(value) != column.shape[1:]):
+      self._to_object(info)
+      column = self.data[info]
+    column[idx] = value
+
+  def _set_column(self, info, values):
+    """
+    Sets the whole info column with the given values. The column is allocated again, given that the new values
+    could have a different shape or type.
+    :param info:
+    :param values: list or array with an element for each agent in the archive
+    :return:
+    """
+    self.data[info] = None
+    if isinstance(values, np.ndarray) and values.dtype != object and len(values) > 0:
+      self.data[info] = self._new_column(values[0])
+      self.data[info][:len(values)] = values
+    else:
+      for idx in range(len(values)):
+        self._write(info, idx, values[idx])
   # ---------------------------------
 
   # ---------------------------------
@@ -75,62 +154,86 @@ class Archive(object):
       assert d in self.stored_info, print("Can't update. {} not among archive stored data. Available: {}".format(d, self.stored_info))
       assert len(data[d]) == self.size, print("Updated {} size mismatch. Given: {} - Archive size: {}".format(d, len(data[d]), self.size))
 
-    # This is slow, but is done not that often, so it is not so important for it to be fast
-    for idx in range(self.size):
-      for d in list(data):
-        info = self.stored_info.index(d) # Get index of info we want to update
-        self.data[idx][info] = data[d][idx]
+    for d in list(data):
+      self._set_column(d, data[d])
   # ---------------------------------
 
   # ---------------------------------
   def store(self, agent):
     """
-    Store data in the archive as a list of: (genome, gt_bd, bd, traj).
-    No need to store the ID given that we store the genome.
-    Saving as a tuple instead of a dict makes the append operation faster
+    Store the stored_info of the agent in the archive.
     :param agent: agent to store
     :return:
     """
-    # If want to use set
-    # self.data.add((self._totuple(agent['genome']), self._totuple(agent['gt_bd']), self._totuple(agent['bd']),
-    #                self._totuple(agent['traj'])))
-    self.data.append([agent[info] for info in self.stored_info])
+    if self.size + 1 > self.capacity:
+      self._grow(self.size + 1)
+    for info in self.stored_info:
+      self._write(info, self.size, agent[info])
+    self._size += 1
   # ---------------------------------
 
   # ---------------------------------
-  def _totuple(self, a):
+  def snapshot(self):
     """
-    This function converts trajectories to tuples to be added to the set
-    :param a:
+    Returns the columns of the archive that can be saved while the search goes on.
+    No copy is needed: the stored rows are never written again, given that new agents are written after them and that
+    growing, updating or converting a column allocates a new array. So the views of the stored rows do not change.
+    :return:
+    """
+    return {info: self[info] for info in self.stored_info}
+
+  def save(self, filepath, filename, snapshot=None):
+    """
+    This function saves the archive as an npz snapshot or as a pkl file containing a dict with a column for each stored info
+    :param filepath:
+    :param name: Name of the file
+    :param snapshot: Snapshot of the archive to save. If None the current archive is saved
     :return:
     """
+    data = self.snapshot() if snapshot is None else snapshot
     try:
-      return tuple(self._totuple(i) for i in a)
-    except TypeError:
-      return a
+      if self.params.snapshot_format == 'npz':
+        save_snapshot(os.path.join(filepath, 'archive_{}.npz'.format(filename)), data,
+                      compress=self.params.snapshot_compress, downcast=self.params.snapshot_float32)
+      else:
+        with open(os.path.join(filepath, 'archive_{}.pkl'.format(filename)), 'wb') as file:
+          pkl.dump(data, file)
+    except Exception as e:
+      print('Cannot Save archive {}.'.format(filename))
+      print('Exception {}'.format(e))
   # ---------------------------------
 
   # ---------------------------------
-  def save(self, filepath, filename):
+  def log(self, filepath, generation, snapshot=None):
     """
-    This function saves the population as a pkl file
+    This function appends to the archive log in filepath/archive_log the agents added to the archive since the last
+    logged generation. This way only the new agents are written at every generation.
+    The log only grows: changes to the agents already logged (e.g. with update) are not saved.
     :param filepath:
-    :param name: Name of the file
+    :param generation: Generation the archive refers to
+    :param snapshot: Snapshot of the archive to log. If None the current archive is logged
     :return:
     """
+    folder = os.path.join(filepath, 'archive_log')
+    if self.archive_log is None or self.archive_log.folder != folder:
+      self.archive_log = ArchiveLog(folder, self.stored_info)
+    if snapshot is None:
+      snapshot = self.snapshot()
     try:
-      with open(os.path.join(filepath, 'archive_{}.pkl'.format(filename)), 'wb') as file:
-        pkl.dump(self.data, file)
+      self.archive_log.append(generation, snapshot, len(snapshot[self.stored_info[0]]))
     except Exception as e:
-      print('Cannot Save archive {}.'.format(filename))
+      print('Cannot log archive generation {}.'.format(generation))
       print('Exception {}'.format(e))
   # ---------------------------------
 
   # ---------------------------------
-  def load(self, filepath):
+  def load(self, filepath, generation=None):
     """
-    This function loads the population
-    :param filepath: File from where to load the population
+    This function loads the archive.
+    The filepath can be either a pkl file, an npz snapshot or an archive log folder, from which the archive at the given generation is
+    rebuilt. Archives saved as a deque of lists, ordered as stored_info, can be loaded as well.
+    :param filepath: File or archive log folder from where to load the archive
+    :param generation: Generation to load from the archive log. If None the last logged one is loaded
     :return:
     """
     if not os.path.exists(filepath):
@@ -139,6 +242,30 @@ class Archive(object):
 
     if self.params is not None and self.params.verbose:
       print('Loading archive from {}'.format(filepath))
-    with open(filepath, 'rb') as file:
-      self.data = pkl.load(file)
-  # ---------------------------------
\ No newline at end of file
+    if ArchiveLog.exists(filepath):
+      data = ArchiveLog(filepath, self.stored_info).read(generation)
+    elif filepath.endswith('.npz'):
+      data = load_snapshot(filepath)
+    else:
+      with open(filepath, 'rb') as file:
+        data = pkl.load(file)
+
+    self.set_data(data)
+
+  def set_data(self, data):
+    """
+    Replaces the content of the archive with the given data
+    :param data: dict with a column for each stored info, or list of agents lists ordered as stored_info
+    :return:
+    """
+    self.reset()
+    if isinstance(data, dict):
+      size = len(data[self.stored_info[0]])
+      self._grow(size)
+      for info in self.stored_info:
+        self._set_column(info, data[info])
+      self._size = size
+    else:
+      for element in data:
+        self.store({info: element[k] for k, info in enumerate(self.stored_info)})
+  # ---------------------------------
@@ -0,0 +1,197 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import json
+import pickle as pkl
+import numpy as np
+
+class ArchiveLog(object):
+  """
+  This class implements an append-only log of the archive, saved in a folder.
+  Each stored info has its own segment file, to which the rows added to the archive are appended at every generation:
+  numerical columns are written as raw binary rows, while object columns are written as a pickled segment per generation.
+  The index file has a json line per generation with the size of the archive and the end offset of each segment file,
+  so the archive at any generation is made by the first rows of the segments.
+  The index line is written after the data, so a partially written generation is ignored.
+  """
+  INDEX = 'index.jsonl'
+  COLUMNS = 'columns.json'
+
+  def __init__(self, folder, stored_info):
+    """
+    Constructor
+    :param folder: Folder of the log
+    :param stored_info: Infos stored in the archive
+    """
+    self.folder = folder
+    self.stored_info = stored_info
+    self.columns = None
+    self.logged_size = None # Rows of the archive that are in the log. Known after the log is opened for writing
+
+  # ---------------------------------
+  @staticmethod
+  def exists(folder):
+    """
+    Returns True if the folder contains an archive log
+    :param folder:
+    :return:
+    """
+    return os.path.exists(os.path.join(folder, ArchiveLog.INDEX))
+
+  def _segment_path(self, info):
+    """
+    Path of the segment file of the info column
+    :param info:
+    :return:
+    """
+    extension = 'pkl' if self.columns[info]['dtype'] == 'object' else 'bin'
+    return os.path.join(self.folder, '{}.{}'.format(info, extension))
+
+  def _load_columns(self):
+    """
+    Loads the type of each column
+    :return:
+    """
+    if self.columns is None and os.path.exists(os.path.join(self.folder, self.COLUMNS)):
+      with open(os.path.join(self.folder, self.COLUMNS)) as f:
+        self.columns = json.load(f)
+
+  def index(self):
+    """
+    Returns the index of the log
+    :return: list of dicts {'generation', 'size', 'offsets'}, ordered by generation
+    """
+    if not os.path.exists(os.path.join(self.folder, self.INDEX)):
+      return []
+    with open(os.path.join(self.folder, self.INDEX)) as f:
+      return [json.loads(line) for line in f if line.strip()]
+
+  def generations(self):
+    """
+    Returns the size of the archive for each logged generation
+    :return: dict {generation: size}
+    """
+    return {entry['generation']: entry['size'] for entry in self.index()}
+  # ---------------------------------
+
+  # ---------------------------------
+  def _open(self, generation):
+    """
+    Opens the log for appending the given generation. The entries of the log that are not before the generation are
+    dropped and the segment files truncated accordingly, so a search restarted from an earlier generation continues
+    the log from there.
+    :param generation:
+    :return:
+    """
+    os.makedirs(self.folder, exist_ok=True)
+    self._load_columns()
+    entries = [entry for entry in self.index() if entry['generation'] < generation]
+    if self.columns is not None:
+      for info in self.stored_info:
+        offset = entries[-1]['offsets'][info] if entries else 0
+        if os.path.exists(self._segment_path(info)):
+          os.truncate(self._segment_path(info), offset)
+    with open(os.path.join(self.folder, self.INDEX), 'w') as f:
+      for entry in entries:
+        f.write(json.dumps(entry) + '\n')
+    self.logged_size = entries[-1]['size'] if entries else 0
+
+  def _set_columns(self, data):
+    """
+    Sets the type of each column from the data of the archive
+    :param data: dict of columns
+    :return:
+    """
+    self.columns = {}
+    for info in self.stored_info:
+      if data[info].dtype == object:
+        self.columns[info] = {'dtype': 'object'}
+      else:
+        self.columns[info] = {'dtype': data[info].dtype.str, 'shape': list(data[info].shape[1:])}
+    with open(os.path.join(self.folder, self.COLUMNS), 'w') as f:
+      json.dump(self.columns, f)
+
+  def append(self, generation, data, size):
+    """
+    Appends the rows of the archive that are not in the log yet, and adds the generation to the index
+    :param generation:
+    :param data: dict of the archive columns, with at least size rows
+    :param size: size of the archive
+    :return:
+    """
+    if self.logged_size is None:
+      self._open(generation)
+    if self.logged_size > size:
+      raise ValueError('Archive of size {} is smaller than the {} logged rows. The log can only be appended'.format(size, self.logged_size))
+
+    if size > self.logged_size:
+      if self.columns is None:
+        self._set_columns(data)
+      for info in self.stored_info:
+        rows = data[info][self.logged_size:size]
+        if self.columns[info]['dtype'] == 'object':
+          with open(self._segment_path(info), 'ab') as f:
+            pkl.dump(list(rows), f)
+        else:
+          if rows.dtype == object or rows.dtype.str != self.columns[info]['dtype'] or list(rows.shape[1:]) != self.columns[info]['shape']:
+            raise ValueError('Rows of {} do not match the logged column type {}'.format(info, self.columns[info]))
+          with open(self._segment_path(info), 'ab') as f:
+            f.write(np.ascontiguousarray(rows).tobytes())
+
+    offsets = {info: os.path.getsize(self._segment_path(info)) if self.columns is not None else 0 for info in self.stored_info}
+    with open(os.path.join(self.folder, self.INDEX), 'a') as f:
+      f.write(json.dumps({'generation': generation, 'size': size, 'offsets': offsets}) + '\n')
+    self.logged_size = size
+  # ---------------------------------
+
+  # ---------------------------------
+  def read(self, generation=None, infos=None, mmap=False):
+    """
+    Reads the archive at the given generation
+    :param generation: If None, the last logged generation is read
+    :param infos: Infos to read. If None all the stored infos are read
+    :param mmap: If True the numerical columns are memory mapped instead of being read, so only the rows that are
+    accessed are read from disk
+    :return: dict of columns
+    """
+    entries = self.index()
+    if generation is not None:
+      entries = [entry for entry in entries if entry['generation'] == generation]
+    if not entries:
+      raise ValueError('Generation {} not in the archive log {}'.format(generation, self.folder))
+    return self.read_rows(entries[-1]['size'], infos=infos, mmap=mmap)
+
+  def read_rows(self, size, infos=None, mmap=False):
+    """
+    Reads the first size agents of the log. The archive of each generation is made by the first agents of the log, up
+    to its size in the index.
+    :param size: Number of agents to read
+    :param infos: Infos to read. If None all the stored infos are read
+    :param mmap: If True the numerical columns are memory mapped instead of being read
+    :return: dict of columns
+    """
+    self._load_columns()
+
+    data = {}
+    for info in self.stored_info if infos is None else infos:
+      if size == 0:
+        data[info] = np.empty(0)
+      elif self.columns[info]['dtype'] == 'object':
+        rows = []
+        with open(self._segment_path(info), 'rb') as f:
+          while len(rows) < size:
+            rows += pkl.load(f)
+        data[info] = np.empty(size, dtype=object)
+        for idx in range(size):
+          data[info][idx] = rows[idx]
+      else:
+        shape = tuple(self.columns[info]['shape'])
+        if mmap:
+          data[info] = np.memmap(self._segment_path(info), dtype=np.dtype(self.columns[info]['dtype']), mode='r',
+                                 shape=(size,) + shape)
+          continue
+        data[info] = np.fromfile(self._segment_path(info), dtype=np.dtype(self.columns[info]['dtype']),
+                                 count=size * int(np.prod(shape))).reshape((size,) + shape)
+    return data
+  # ---------------------------------
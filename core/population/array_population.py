@@ -0,0 +1,356 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import numpy as np
+import pickle as pkl
+from environments import registered_envs
+from core import random_streams
+from core.population.snapshot import save_snapshot, load_snapshot
+
+class ArrayPopulation(object):
+  """
+  Population class based on a structure of arrays.
+  Each key of the agent template is stored as an array with a row per agent: the genomes are a
+  (size, genome_size) matrix, while bd, novelty, reward, id and parent are parallel arrays.
+  Numerical columns are typed arrays. Columns containing None or values of different shapes are object arrays.
+  Columns that have never been set are not allocated and read as None for each agent.
+  The added agents are kept in a pending list and appended to the columns all together the next time the columns are
+  accessed, so adding the agents one at the time does not copy the columns at each addition.
+  It has the same interface of Population, so the two can be used interchangeably.
+  """
+
+  # ---------------------------------
+  def __init__(self, parameters, init_size=None, name='population'):
+    """
+    Constructor. Takes as input the parameters
+    :param parameters:
+    """
+    self._data = {}
+    self._pending = [] # Agents added and not yet appended to the columns
+    self._size = 0
+    self.agent_id = 0
+    self.name = name
+    self.params = parameters
+    self.agent_template = self.params.agent_template
+
+    # Instantiated only to extract genome size
+    self.controller = registered_envs[self.params.env_name]['controller']['controller'](
+      input_size=registered_envs[self.params.env_name]['controller']['input_size'],
+      output_size=registered_envs[self.params.env_name]['controller']['output_size'])
+
+    self.genome_size = self.controller.genome_size
+    self.genome_limit = self.params.genome_limit
+    self.rng = random_streams.get_generator(random_streams.get_entropy(self.params.seed), random_streams.POPULATION_STREAM)
+    if init_size is None:
+      self.init_pop_size = self.params.pop_size
+    else:
+      self.init_pop_size = init_size
+
+    # All the genomes are sampled at once. The samples are the same as the ones of Population, where they are
+    # drawn one agent at the time.
+    genomes = np.clip(self.rng.normal(0, 1, size=(self.init_pop_size, self.genome_size)), self.genome_limit[0], self.genome_limit[1])
+    self.set_agents(genome=genomes, id=np.arange(self.agent_id, self.agent_id + self.init_pop_size))
+    self.agent_id += self.init_pop_size
+  # ---------------------------------
+
+  # ---------------------------------
+  @property
+  def data(self):
+    """
+    Dict of the columns of the population. The pending agents are appended before returning it
+    """
+    if self._pending:
+      self._append_pending()
+    return self._data
+
+  @data.setter
+  def data(self, data):
+    """
+    Sets the columns of the population. Pending agents are discarded
+    :param data:
+    :return:
+    """
+    self._pending = []
+    self._data = data
+  # ---------------------------------
+
+  # ---------------------------------
+  # These function make the class indexable and iterable like a list
+  def __iter__(self):
+    """
+    Allows to directly iterate the pop. Each element is an agent dict
+    :return:
+    """
+    return (self[idx] for idx in range(self.size))
+
+  def __getitem__(self, item):
+    """
+    Returns the asked property
+    :param item: item to return. Can be an agent index or a key
+    :return: returns the corresponding agent as a dict or the column as an array
+    """
+    if type(item) == str:
+      assert item in self.keys, 'Wrong key given. Available: {} - Given: {}'.format(self.keys, item)
+      if item not in self.data:
+        return np.full(self.size, None, dtype=object)
+      return self.data[item]
+    else:
+      assert self.size > item > -self.size - 1, 'Index out of range'
+      return {key: self.data[key][item] if key in self.data else None for key in self.keys}
+
+  def __setitem__(self, key, value):
+    """
+    Set the agent in position key with the ones passed as value
+    :param key: if int: position of the agent to set. if something else: column to update
+    :param value: New agent to set or list of elements to update
+    :return:
+    """
+    if type(key) == str:
+      assert key in self.keys, 'Wrong key given. Available: {} - Given: {}'.format(self.keys, key)
+      assert len(value) == self.size, 'List of values different from pop size. N of values: {} - Pop size: {}'.format(len(value), self.size)
+      self.data[key] = self._to_column(value)
+    else:
+      assert self.size > key > -self.size - 1, 'Index out of range'
+      for info in value:
+        self._write(info, key, value[info])
+
+  def __len__(self):
+    """
+    Returns the length of the population
+    """
+    return self.size
+
+  @property
+  def size(self):
+    """
+    Size of the population
+    """
+    return self._size
+
+  @property
+  def keys(self):
+    """
+    Keys of the agents. These are the ones of the template plus any other added during the search (e.g. surprise)
+    """
+    return list(self.agent_template.keys()) + [key for key in self.data if key not in self.agent_template]
+
+  @property
+  def pop(self):
+    """
+    List of agents as dicts. Kept for compatibility with Population
+    """
+    return list(self)
+
+  @pop.setter
+  def pop(self, agents):
+    """
+    Sets the population from a list of agents dicts
+    :param agents:
+    :return:
+    """
+    self.data = {}
+    self._size = len(agents)
+    keys = []
+    for agent in agents:
+      keys += [key for key in agent if key not in keys]
+    for key in keys:
+      values = [agent.get(key) for agent in agents]
+      if any(value is not None for value in values):
+        self.data[key] = self._to_column(values)
+  # ---------------------------------
+
+  # ---------------------------------
+  @staticmethod
+  def _to_object(values):
+    """
+    Converts the values to an object array with an element per agent
+    :param values:
+    :return:
+    """
+    column = np.empty(len(values), dtype=object)
+    for idx in range(len(values)):
+      column[idx] = values[idx]
+    return column
+
+  def _to_column(self, values):
+    """
+    Converts the values to a column. Numerical values are stored as typed arrays, the rest as object arrays.
+    :param values:
+    :return:
+    """
+    try:
+      column = np.asarray(values)
+    except ValueError: # Inhomogeneous values
+      return self._to_object(values)
+    if column.dtype == object or column.ndim == 0:
+      return self._to_object(values)
+    return column
+
+  def _write(self, key, idx, value):
+    """
+    Writes the value for the agent in position idx
+    :param key:
+    :param idx:
+    :param value:
+    :return:
+    """
+    if key not in self.data:
+      if value is None:
+        return # Column is still not set
+      value_array = np.asarray(value)
+      if value_array.dtype.kind in 'biuf': # Agents for which the value is not set yet are NaN
+        self.data[key] = np.full((self.size,) + value_array.shape, np.nan)
+      else:
+        self.data[key] = np.full(self.size, None, dtype=object)
+    column = self.data[key]
+    if column.dtype != object and (value is None or np.shape(value) != column.shape[1:]):
+      column = self._to_object(column)
+      self.data[key] = column
+    column[idx] = value
+
+  def _column_or_none(self, key):
+    """
+    Returns the column or an object array of None if the column is not set
+    :param key:
+    :return:
+    """
+    return self.data[key] if key in self.data else np.full(self.size, None, dtype=object)
+  # ---------------------------------
+
+  # ---------------------------------
+  def set_agents(self, **columns):
+    """
+    Sets the whole population from the given columns. Columns not given are not set.
+    :param columns: key=values pairs. All the values need to have the same length
+    :return:
+    """
+    sizes = [len(columns[key]) for key in columns]
+    assert len(set(sizes)) <= 1, 'Columns of different sizes given: {}'.format(sizes)
+    self.data = {key: self._to_column(columns[key]) for key in columns}
+    self._size = sizes[0] if sizes else 0
+
+  def add(self, agent=None):
+    """
+    Adds agent to population.
+    :param agent: Agent to add. If None generates a new agent
+    :return:
+    """
+    if agent is None:
+      agent = self.agent_template.copy()
+      agent['id'] = self.agent_id
+      agent['genome'] = self.generate_gen()
+      self.agent_id += 1 # The count of the agent_id is always +1 from the one of the last added
+
+    self._pending.append(agent.copy())
+    self._size += 1
+
+  def _append_pending(self):
+    """
+    Appends the pending agents to the columns
+    :return:
+    """
+    agents, self._pending = self._pending, []
+    keys = []
+    for agent in agents:
+      keys += [key for key in agent if key not in keys]
+    data = {}
+    for key in keys:
+      values = [agent.get(key) for agent in agents]
+      if any(value is not None for value in values):
+        data[key] = self._to_column(values)
+    self._size -= len(agents) # So the columns not set are filled for the agents already in the columns
+    self._data = self._concatenate(data, len(agents))
+    self._size += len(agents)
+
+  def _concatenate(self, data, size):
+    """
+    Returns the columns obtained by appending the given columns to the ones of the population
+    :param data: dict of columns
+    :param size: number of agents in the given columns
+    :return: dict of concatenated columns
+    """
+    concatenated = {}
+    for key in list(self.data.keys()) + [key for key in data if key not in self.data]:
+      columns = [self._column_or_none(key),
+                 data[key] if key in data else np.full(size, None, dtype=object)]
+      if any(column.dtype == object for column in columns) or columns[0].shape[1:] != columns[1].shape[1:]:
+        columns = [self._to_object(column) for column in columns]
+      concatenated[key] = np.concatenate(columns)
+    return concatenated
+
+  def select(self, idx, other=None):
+    """
+    Keeps only the agents in positions idx of the concatenation of this population and the other one
+    :param idx: indexes of the agents to keep
+    :param other: population whose agents are appended to the ones of this population before selecting
+    :return:
+    """
+    idx = np.asarray(idx, dtype=int)
+    data = self.data if other is None else self._concatenate(other.data, other.size)
+    self.data = {key: data[key][idx] for key in data}
+    self._size = len(idx)
+  # ---------------------------------
+
+  # ---------------------------------
+  def generate_gen(self):
+    """
+    This function generates a random genome of size: genome_size
+    :return:
+    """
+    return np.clip(self.rng.normal(0, 1, size=self.genome_size), self.genome_limit[0], self.genome_limit[1])
+  # ---------------------------------
+
+  # ---------------------------------
+  def snapshot(self):
+    """
+    Returns a copy of the columns that can be saved while the search goes on
+    :return:
+    """
+    return {key: self.data[key].copy() for key in self.data}
+
+  def save(self, filepath, filename, snapshot=None):
+    """
+    This function saves the population as an npz snapshot or as a pkl file containing a dict with a column per key
+    :param filepath:
+    :param name: Name of the file
+    :param snapshot: Snapshot of the population to save. If None the current population is saved
+    :return:
+    """
+    data = self.data if snapshot is None else snapshot
+    try:
+      if self.params.snapshot_format == 'npz':
+        save_snapshot(os.path.join(filepath, '{}_{}.npz'.format(self.name, filename)), data,
+                      compress=self.params.snapshot_compress, downcast=self.params.snapshot_float32)
+      else:
+        with open(os.path.join(filepath, '{}_{}.pkl'.format(self.name, filename)), 'wb') as file:
+          pkl.dump(data, file)
+    except Exception as e:
+      print('Cannot Save {} {}.'.format(self.name, filename))
+      print('Exception {}'.format(e))
+  # ---------------------------------
+
+  # ---------------------------------
+  def load(self, filepath):
+    """
+    This function loads the population. Populations saved as a list of agents and npz snapshots can be loaded as well.
+    :param filepath: File from where to load the population
+    :return:
+    """
+    if not os.path.exists(filepath):
+      print('File to load not found.')
+      return
+
+    if self.params.verbose:
+      print('Loading {} from {}'.format(self.name, filepath))
+    if filepath.endswith('.npz'):
+      data = load_snapshot(filepath)
+    else:
+      with open(filepath, 'rb') as file:
+        data = pkl.load(file)
+    if isinstance(data, dict):
+      self.set_agents(**data)
+    else:
+      self.pop = data
+    self.agent_id = np.max(self['id'])
+  # ---------------------------------
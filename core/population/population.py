@@ -5,6 +5,8 @@ import os
 import numpy as np
 import pickle as pkl
 from environments import registered_envs
+from core import random_streams
+from core.population.snapshot import save_snapshot, load_snapshot
 
 class Population(object):
   """
@@ -33,6 +35,7 @@ class Population(object):
 
     self.genome_size = self.controller.genome_size
     self.genome_limit = self.params.genome_limit
+    self.rng = random_streams.get_generator(random_streams.get_entropy(self.params.seed), random_streams.POPULATION_STREAM)
     if init_size is None:
       self.init_pop_size = self.params.pop_size
     else:
@@ -113,6 +116,29 @@ class Population(object):
       self.agent_id += 1 # The count of the agent_id is always +1 from the one of the last added
 
     self.pop.append(agent)
+
+  def set_agents(self, **columns):
+    """
+    Sets the whole population from the given columns. Keys of the template not given are left to their default
+    :param columns: key=values pairs. All the values need to have the same length
+    :return:
+    """
+    sizes = [len(columns[key]) for key in columns]
+    assert len(set(sizes)) <= 1, 'Columns of different sizes given: {}'.format(sizes)
+    self.pop = [self.agent_template.copy() for k in range(sizes[0] if sizes else 0)]
+    for key in columns:
+      for agent, value in zip(self.pop, columns[key]):
+        agent[key] = value
+
+  def select(self, idx, other=None):
+    """
+    Keeps only the agents in positions idx of the concatenation of this population and the other one
+    :param idx: indexes of the agents to keep
+    :param other: population whose agents are appended to the ones of this population before selecting
+    :return:
+    """
+    agents = self.pop if other is None else self.pop + other.pop
+    self.pop = [agents[i] for i in idx]
   # ---------------------------------
 
   # ---------------------------------
@@ -121,20 +147,34 @@ class Population(object):
     This function generates a random genome of size: genome_size
     :return:
     """
-    return np.clip(np.random.normal(0, 1, size=self.genome_size), self.genome_limit[0], self.genome_limit[1])
+    return np.clip(self.rng.normal(0, 1, size=self.genome_size), self.genome_limit[0], self.genome_limit[1])
   # ---------------------------------
 
   # ---------------------------------
-  def save(self, filepath, filename):
+  def snapshot(self):
+    """
+    Returns a copy of the population that can be saved while the search goes on.
+    The agents are copied, while their values are shared given that they are replaced and not modified in place.
+    :return:
     """
-    This function saves the population as a pkl file
+    return [agent.copy() for agent in self.pop]
+
+  def save(self, filepath, filename, snapshot=None):
+    """
+    This function saves the population as an npz snapshot or as a pkl file
     :param filepath:
     :param name: Name of the file
+    :param snapshot: Snapshot of the population to save. If None the current population is saved
     :return:
     """
+    data = self.pop if snapshot is None else snapshot
     try:
-      with open(os.path.join(filepath, '{}_{}.pkl'.format(self.name, filename)), 'wb') as file:
-        pkl.dump(self.pop, file)
+      if self.params.snapshot_format == 'npz':
+        save_snapshot(os.path.join(filepath, '{}_{}.npz'.format(self.name, filename)), data,
+                      compress=self.params.snapshot_compress, downcast=self.params.snapshot_float32)
+      else:
+        with open(os.path.join(filepath, '{}_{}.pkl'.format(self.name, filename)), 'wb') as file:
+          pkl.dump(data, file)
     except Exception as e:
       print('Cannot Save {} {}.'.format(self.name, filename))
       print('Exception {}'.format(e))
@@ -143,7 +183,7 @@ class Population(object):
   # ---------------------------------
   def load(self, filepath):
     """
-    This function loads the population
+    This function loads the population. Populations saved by ArrayPopulation, as a dict of columns, and npz snapshots can be loaded as well.
     :param filepath: File from where to load the population
     :return:
     """
@@ -153,7 +193,14 @@ class Population(object):
 
     if self.params.verbose:
       print('Loading {} from {}'.format(self.name, filepath))
-    with open(filepath, 'rb') as file:
-      self.pop = pkl.load(file)
+    if filepath.endswith('.npz'):
+      data = load_snapshot(filepath)
+    else:
+      with open(filepath, 'rb') as file:
+        data = pkl.load(file)
+    if isinstance(data, dict):
+      size = len(next(iter(data.values()))) if data else 0
+      data = [dict(self.agent_template, **{key: data[key][idx] for key in data}) for idx in range(size)]
+    self.pop = data
     self.agent_id = np.max(self['id'])
   # ---------------------------------
\ No newline at end of file
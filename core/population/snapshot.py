@@ -0,0 +1,142 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import struct
+import zipfile
+import numpy as np
+
+# In this file there are the functions to save and load the snapshots of populations and archives as npz files.
+# Each key is saved as a typed contiguous array with a row per agent, so the snapshots do not depend on pickle.
+# Columns in which some agents have None are saved as typed arrays together with a mask of the None values.
+# The None values are filled with NONE_FILL in signed int columns (e.g. the parent of the first agents) and with 0 in the
+# others, so the columns keep their type.
+
+DOWNCAST_KEYS = ['genome', 'bd'] # Keys that can be saved as float32
+NONE_MASK = '{}__none' # Name of the array with the mask of the None values of a column
+NONE_FILL = -1 # Value of the None elements in the signed int columns
+
+def to_columns(data, keys=None):
+  """
+  Converts the data of a population or archive to a dict of columns
+  :param data: dict of columns, list of agents dicts, or list of agents lists ordered as keys (e.g. archive deque)
+  :param keys: keys of the elements of the lists. Needed only if data is a list of lists
+  :return: dict of columns
+  """
+  if isinstance(data, dict):
+    return data
+  data = list(data)
+  if len(data) == 0:
+    return {}
+  if isinstance(data[0], dict):
+    keys = list(data[0].keys())
+    return {key: [agent.get(key) for agent in data] for key in keys}
+  assert keys is not None, 'Keys needed to convert lists of agents lists'
+  return {key: [agent[k] for agent in data] for k, key in enumerate(keys)}
+
+def _to_array(values):
+  """
+  Converts the values of a column to a typed array, with the mask of the None values.
+  :param values:
+  :return: array, mask of None values or None if there are no None values. None if the column cannot be typed
+  """
+  if isinstance(values, np.ndarray) and values.dtype != object:
+    return values, None
+  mask = np.array([value is None for value in values], dtype=bool)
+  if np.all(mask):
+    return None # Column not set
+  try:
+    set_values = np.array([value for value in values if value is not None])
+  except ValueError: # Inhomogeneous values
+    return None
+  if set_values.dtype == object or set_values.dtype.kind not in 'biufU':
+    return None
+  if not np.any(mask):
+    return set_values, None
+  array = np.zeros((len(values),) + set_values.shape[1:], dtype=set_values.dtype)
+  if set_values.dtype.kind == 'i':
+    array[mask] = NONE_FILL
+  array[~mask] = set_values
+  return array, mask
+
+def save_snapshot(filepath, data, compress=False, downcast=False):
+  """
+  Saves the columns in an npz file
+  :param filepath:
+  :param data: dict of columns or list of agents dicts
+  :param compress: If True the file is compressed
+  :param downcast: If True, the float columns in DOWNCAST_KEYS are saved as float32
+  :return:
+  """
+  arrays = {}
+  for key, values in to_columns(data).items():
+    converted = _to_array(values)
+    if converted is None:
+      if any(value is not None for value in values):
+        raise ValueError('Column {} cannot be saved as a typed array'.format(key))
+      continue # Unset columns are not saved
+    array, mask = converted
+    if downcast and key in DOWNCAST_KEYS and array.dtype.kind == 'f':
+      array = array.astype(np.float32)
+    arrays[key] = array
+    if mask is not None:
+      arrays[NONE_MASK.format(key)] = mask
+
+  with open(filepath, 'wb') as file:
+    if compress:
+      np.savez_compressed(file, **arrays)
+    else:
+      np.savez(file, **arrays)
+
+def _mmap_member(filepath, info):
+  """
+  Memory maps an array stored without compression in the npz file
+  :param filepath:
+  :param info: ZipInfo of the array
+  :return: read-only memory mapped array
+  """
+  with open(filepath, 'rb') as file:
+    file.seek(info.header_offset)
+    local_header = file.read(30)
+    name_length, extra_length = struct.unpack('<HH', local_header[26:30])
+    file.seek(info.header_offset + 30 + name_length + extra_length)
+    version = np.lib.format.read_magic(file)
+    if version == (1, 0):
+      shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(file)
+    else:
+      shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(file)
+    offset = file.tell()
+  if dtype.hasobject:
+    raise ValueError('Object arrays cannot be memory mapped')
+  if len(shape) > 0 and np.prod(shape) == 0:
+    return np.empty(shape, dtype=dtype)
+  return np.memmap(filepath, dtype=dtype, mode='r', shape=shape, offset=offset, order='F' if fortran_order else 'C')
+
+def load_snapshot(filepath, keys=None, mmap=False):
+  """
+  Loads the columns from an npz file. Only the asked keys are read.
+  :param filepath:
+  :param keys: Keys to load. If None, all the keys are loaded
+  :param mmap: If True, the uncompressed columns are memory mapped instead of being read, so only the rows that are
+  accessed are read from disk. Compressed columns and columns with None values are always read.
+  :return: dict of columns. The columns with None values are object arrays
+  """
+  columns = {}
+  with np.load(filepath, allow_pickle=False) as data:
+    if mmap:
+      with zipfile.ZipFile(filepath) as archive:
+        members = {info.filename[:-len('.npy')]: info for info in archive.infolist()}
+    for key in data.files:
+      if key.endswith(NONE_MASK.format('')) or (keys is not None and key not in keys):
+        continue
+      if NONE_MASK.format(key) in data.files:
+        mask = data[NONE_MASK.format(key)]
+        column = data[key]
+        values = np.empty(len(column), dtype=object)
+        for idx in range(len(column)):
+          values[idx] = None if mask[idx] else column[idx]
+        columns[key] = values
+      elif mmap and members[key].compress_type == zipfile.ZIP_STORED:
+        columns[key] = _mmap_member(filepath, members[key])
+      else:
+        columns[key] = data[key]
+  return columns
@@ -0,0 +1,30 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+
+# Every random operation of the search draws from its own stream. A stream is identified by the experiment seed and
+# by a tuple of keys: the kind of operation, followed by the generation and the block of agents it is used for.
+# This way the samples do not depend on which process performs the operation nor on how many processes there are.
+POPULATION_STREAM = 0
+MUTATION_STREAM = 1
+ARCHIVE_STREAM = 2
+STEADY_STATE_STREAM = 3
+LSH_STREAM = 4
+
+def get_entropy(seed):
+  """
+  Returns the entropy from which all the streams are derived. If the seed is None, fresh entropy is drawn from the OS.
+  :param seed:
+  :return:
+  """
+  return np.random.SeedSequence(seed).entropy
+
+def get_generator(entropy, *keys):
+  """
+  Returns the random generator of the stream identified by the entropy and the keys
+  :param entropy: Entropy of the experiment, as returned by get_entropy
+  :param keys: Integers identifying the stream. E.g.: (MUTATION_STREAM, generation, block)
+  :return: np.random.Generator
+  """
+  return np.random.Generator(np.random.PCG64(np.random.SeedSequence(entropy, spawn_key=keys)))
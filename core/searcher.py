@@ -4,17 +4,72 @@
 #Here I make the class that creates everything. I pass the parameters as init arguments, this one creates the param class, and the popu, arch, opt alg
 
 import os
-from core.population import Population
-from core.evolvers import NoveltySearch
+from core.population import make_population
+from core.population.archive_log import ArchiveLog
+from core.evolvers import NoveltySearch, SteadyStateNoveltySearch
 from core.behavior_descriptors.behavior_descriptors import BehaviorDescriptor
-from core import Evaluator
+from core import Evaluator, BatchEvaluator
+from core import shared_buffers
+from core.evaluation_cache import EvaluationCache
+from core.distributed import DistributedEvaluator
+from core.checkpoint_writer import CheckpointWriter
+from core.coverage_tracker import CoverageTracker
+from environments.environments import registered_envs
+import json
+import queue
 import multiprocessing as mp
+from collections import deque
 from timeit import default_timer as timer
 
+import numpy as np
+
 evaluator = None
+bd_extractor = None
 main_pool = None # Using pool as global prevents the creation of new environments at every generation
 
 
+def init_process(parameters):
+  """
+  This function is used to initialize the pool so each process has its own instance of the evaluator and of the
+  BD extractor. This way the parameters are sent to each worker only once.
+  :param parameters:
+  :return:
+  """
+  global evaluator, bd_extractor
+  if parameters.eval_batch_size > 0:
+    evaluator = BatchEvaluator(parameters)
+  else:
+    evaluator = Evaluator(parameters)
+  bd_extractor = BehaviorDescriptor(parameters)
+
+def evaluate_genomes(genomes):
+  """
+  This function evaluates a chunk of genomes in the worker.
+  Only the genomes are sent to the worker and only the evaluation results are sent back.
+  :param genomes: Matrix of genomes
+  :return: list of (reward, bd, surprise), one for each genome
+  """
+  global evaluator, bd_extractor
+  return evaluator.evaluate_genomes(genomes, bd_extractor)
+
+def evaluate_slots(task):
+  """
+  This function evaluates the genomes in a range of slots of the shared evaluation buffers, and writes the results
+  in the buffers. Only the specs of the buffers and the range of slots are sent to the worker.
+  :param task: (specs, start, end)
+  :return: Number of evaluated genomes
+  """
+  global evaluator, bd_extractor
+  specs, start, end = task
+  buffers = shared_buffers.attach_specs(specs)
+  results = evaluator.evaluate_genomes(buffers['genome'][start:end], bd_extractor)
+  for slot, (reward, bd, surprise) in enumerate(results, start):
+    buffers['reward'][slot] = reward
+    buffers['bd'][slot] = bd
+    buffers['surprise'][slot] = np.nan if surprise is None else surprise
+  return end - start
+
+
 class Searcher(object):
   """
   This class creates the instance of the NS algorithm and everything related
@@ -25,48 +80,138 @@ class Searcher(object):
 
     self.generation = 0
 
+    if self.parameters.steady_state:
+      self.evolver = SteadyStateNoveltySearch(self.parameters)
+    else:
+      self.evolver = NoveltySearch(self.parameters)
+    self.population = make_population(self.parameters, init_size=self.parameters.pop_size)
+
     if self.parameters.multiprocesses:
+      if self.parameters.shared_memory:
+        # Created before the pool, so that the workers share the resource tracker of the shared memory
+        self.shared_buffers = shared_buffers.SharedEvaluationBuffers(
+          genome_size=self.population.genome_size, bd_shape=self.bd_extractor.get_bd_shape(),
+          capacity=self.parameters.pop_size * (1 + self.parameters.offsprings_per_parent))
       global main_pool
-      main_pool = mp.Pool(initializer=self.init_process, processes=self.parameters.multiprocesses)
-    else:
-      self.evaluator = Evaluator(self.parameters)
+      main_pool = mp.Pool(initializer=init_process, initargs=(self.parameters,), processes=self.parameters.multiprocesses)
+
+    if self.parameters.distributed_address is not None:
+      # The evaluation is done by the workers connected over TCP. The pool, if any, is used for the rest
+      self.distributed_evaluator = DistributedEvaluator(self.parameters)
+    elif not self.parameters.multiprocesses:
+      if self.parameters.eval_batch_size > 0:
+        self.evaluator = BatchEvaluator(self.parameters)
+      else:
+        self.evaluator = Evaluator(self.parameters)
 
-    self.evolver = NoveltySearch(self.parameters)
-    self.population = Population(self.parameters, init_size=self.parameters.pop_size)
     self.offsprings = None
+    self.evaluated = queue.Queue() # Agents whose evaluation is done, in steady-state mode
+    self.to_evaluate = [] # Agents waiting to be evaluated without the pool, in steady-state mode
+    self.running = 0 # Agents being evaluated in steady-state mode
     self.ns_archive = self.evolver.archive
 
-  def init_process(self):
+    # Evaluations can be reused only if they are deterministic, that is with a fixed seed
+    if self.parameters.eval_cache_size > 0 and self.parameters.seed is not None:
+      self.eval_cache = EvaluationCache(self.parameters.env_name, self.parameters.seed, max_size=self.parameters.eval_cache_size)
+    else:
+      self.eval_cache = None
+
+    self.checkpoint_writer = CheckpointWriter()
+    self.saved_generations = deque()
+
+    grid = registered_envs[self.parameters.env_name].get('grid')
+    if self.parameters.track_coverage and grid is not None:
+      self.coverage_tracker = CoverageTracker(grid)
+    else:
+      self.coverage_tracker = None
+    self.coverage_records = [] # Coverage of the generations not saved yet
+
+  def _get_chunks(self, size, workers):
     """
-    This function is used to initialize the pool so each process has its own instance of the evaluator
-    :return:
+    This function splits the agents in the chunks that are sent to the workers.
+    With batched evaluation each chunk is a batch, otherwise the agents are split in 4 chunks per worker.
+    :param size: Number of agents
+    :param workers: Number of workers
+    :return: list of (start, end) ranges
     """
-    global evaluator
-    evaluator = Evaluator(self.parameters)
+    if self.parameters.eval_batch_size > 0:
+      chunk_size = self.parameters.eval_batch_size
+    else:
+      chunk_size = max(int(np.ceil(size / (4 * max(workers, 1)))), 1)
+    return [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
 
-  def _feed_eval(self, agent):
+  def _needs_evaluation(self, pop):
     """
-    This function feeds the agent to the evaluator and returns the updated agent
-    :param agent:
+    Returns a mask of the agents that do not carry an evaluation yet. These are the ones whose BD is not set.
+    :param pop:
     :return:
     """
-    global evaluator
-    eval_agent = evaluator(agent, self.bd_extractor.__call__) # Is passing the call better than init the evaluator with the bd inside???
-    return eval_agent
+    bds = pop['bd']
+    if isinstance(bds, np.ndarray) and bds.dtype != object:
+      return np.isnan(np.reshape(bds, (len(bds), -1))).any(axis=1)
+    return np.array([bd is None for bd in bds], dtype=bool)
+
+  def _run_evaluation(self, genomes, pool=None):
+    """
+    This function evaluates the genomes in the environment, by passing them to the parallel evaluators if available.
+    :param genomes: Matrix of genomes
+    :return: list of (reward, bd, surprise), one for each genome
+    """
+    if self.parameters.distributed_address is not None:
+      chunks = [genomes[start:end] for start, end in self._get_chunks(len(genomes), self.distributed_evaluator.size)]
+      return [result for chunk in self.distributed_evaluator.evaluate(chunks) for result in chunk]
+    elif self.parameters.multiprocesses and self.parameters.shared_memory:
+      self.shared_buffers.reserve(len(genomes))
+      self.shared_buffers['genome'][:len(genomes)] = genomes
+      chunks = self._get_chunks(len(genomes), self.parameters.multiprocesses)
+      pool.map(evaluate_slots, [(self.shared_buffers.specs, start, end) for start, end in chunks])
+      rewards = self.shared_buffers['reward'][:len(genomes)].copy()
+      bds = self.shared_buffers['bd'][:len(genomes)].copy()
+      surprises = [None if np.isnan(surprise) else surprise for surprise in self.shared_buffers['surprise'][:len(genomes)]]
+      return list(zip(rewards, bds, surprises))
+    elif self.parameters.multiprocesses:
+      chunks = [genomes[start:end] for start, end in self._get_chunks(len(genomes), self.parameters.multiprocesses)]
+      return [result for chunk in pool.map(evaluate_genomes, chunks) for result in chunk]
+    else:
+      return self.evaluator.evaluate_genomes(genomes, self.bd_extractor)
 
   def evaluate_in_env(self, pop, pool=None):
     """
     This function evaluates the population in the environment by passing it to the parallel evaluators.
+    If the evaluation cache is used, agents that already carry an evaluation (e.g. surviving parents) are not
+    evaluated again, and the ones whose genome is in the cache get the cached evaluation.
     :return:
     """
     if self.parameters.verbose: print('Evaluating {} in environment.'.format(pop.name))
-    if self.parameters.multiprocesses:
-      pop.pop = pool.map(self._feed_eval, pop.pop) # As long as the ID is fine, the order of the element in the list does not matter
+    if pop.size == 0:
+      return
+    genomes = np.asarray(pop['genome'])
+    evaluations = {}
+    if self.eval_cache is None:
+      to_evaluate = list(range(pop.size))
     else:
-      for i in range(pop.size):
-        if self.parameters.verbose: print(".", end = '') # The end prevents the newline
-        pop[i] = self.evaluator(pop[i], self.bd_extractor)
-      if self.parameters.verbose: print()
+      to_evaluate = []
+      for i in np.flatnonzero(self._needs_evaluation(pop)):
+        cached = self.eval_cache.get(genomes[i])
+        if cached is None:
+          to_evaluate.append(i)
+        else:
+          evaluations[i] = cached
+
+    if len(to_evaluate) > 0:
+      for i, evaluation in zip(to_evaluate, self._run_evaluation(genomes[to_evaluate], pool)):
+        evaluations[i] = evaluation
+        if self.eval_cache is not None:
+          self.eval_cache.put(genomes[i], evaluation)
+    if len(evaluations) == 0:
+      return
+
+    rewards, bds, surprises = list(pop['reward']), list(pop['bd']), list(pop['surprise'])
+    for i in evaluations:
+      rewards[i], bds[i], surprises[i] = evaluations[i]
+    pop['reward'] = rewards
+    pop['bd'] = bds
+    pop['surprise'] = surprises
 
   def generational_step(self):
     """
@@ -78,9 +223,8 @@ class Searcher(object):
     global main_pool
     start_time = timer()
 
-    # NB if you pass a pool here the offsprings are not well generated. This is probably due to the fact that
-    # the sampling for the mutation are done in parallel so multiple offsprings will have same mutations.
-    self.offsprings = self.evolver.generate_offspring(self.population, pool=None) # Generate offsprings
+    # Each block of offsprings is mutated with its own random stream, so the offsprings do not depend on the pool
+    self.offsprings = self.evolver.generate_offspring(self.population, pool=main_pool) # Generate offsprings
 
     # Evaluate population and offsprings in the environment
     self.evaluate_in_env(self.population, pool=main_pool)
@@ -88,16 +232,172 @@ class Searcher(object):
 
     # Do evolution stuff #TODO maybe can wrap these 3 functions into a single ea.step function
     self.evolver.evaluate_performances(self.population, self.offsprings, pool=main_pool)  # Calculate novelty/fitness/curiosity etc
+    archive_size = self.evolver.archive.size
     self.evolver.update_archive(self.offsprings)
     self.evolver.update_population(self.population, self.offsprings)
 
+    self.end_generation(archive_size)
+    return timer() - start_time
+
+  def end_generation(self, archive_size):
+    """
+    This function closes the generation: updates the coverage with the agents added to the archive and saves.
+    :param archive_size: Size of the archive at the beginning of the generation
+    :return:
+    """
     self.generation += 1
+    if self.coverage_tracker is not None:
+      self.coverage_tracker.add(self.evolver.archive['bd'][archive_size:])
+      self.coverage_records.append({'generation': self.generation,
+                                    'archive_size': self.evolver.archive.size,
+                                    'coverage': self.coverage_tracker.coverage,
+                                    'uniformity': self.coverage_tracker.uniformity})
+      if self.parameters.verbose: print('Coverage: {coverage:.4f} - Uniformity: {uniformity:.4f}'.format(**self.coverage_records[-1]))
+
+    self.save_generation()
+
+  # ---------------------------------
+  def _max_running(self):
+    """
+    Number of agents evaluated at the same time in steady-state mode. With the pool each worker has an agent in queue
+    besides the one it is evaluating, so it never waits for the main process.
+    :return:
+    """
+    if self.parameters.distributed_address is not None:
+      return 2 * max(self.distributed_evaluator.size, 1)
+    elif self.parameters.multiprocesses:
+      return 2 * self.parameters.multiprocesses
+    return 1
 
-    # Save pop, archive and off
-    self.population.save(self.parameters.save_path, 'gen_{}'.format(self.generation))
-    self.evolver.archive.save(self.parameters.save_path, 'gen_{}'.format(self.generation))
-    self.offsprings.save(self.parameters.save_path, 'gen_{}'.format(self.generation))
+  def _start_evaluation(self, agent, pool=None):
+    """
+    This function starts the evaluation of the agent. With the pool, the agent is evaluated asynchronously and put in
+    the evaluated queue as soon as it is done. Otherwise it is evaluated when its evaluation is needed.
+    :param agent:
+    :param pool:
+    :return:
+    """
+    self.running += 1
+    cached = None if self.eval_cache is None else self.eval_cache.get(agent['genome'])
+    if cached is not None:
+      self.evaluated.put((agent, cached))
+    elif pool is not None and self.parameters.distributed_address is None:
+      pool.apply_async(evaluate_genomes, args=(np.atleast_2d(agent['genome']),),
+                       callback=lambda results: self.evaluated.put((agent, results[0])),
+                       error_callback=lambda e: self.evaluated.put((agent, e)))
+    else:
+      self.to_evaluate.append(agent)
+
+  def _next_evaluated(self, pool=None):
+    """
+    This function returns the first agent whose evaluation is done, waiting for it if needed.
+    :param pool:
+    :return: agent with reward, bd and surprise set
+    """
+    if self.evaluated.empty() and self.to_evaluate:
+      agents, self.to_evaluate = self.to_evaluate, []
+      for agent, evaluation in zip(agents, self._run_evaluation(np.stack([agent['genome'] for agent in agents]), pool)):
+        self.evaluated.put((agent, evaluation))
+    agent, evaluation = self.evaluated.get()
+    self.running -= 1
+    if isinstance(evaluation, Exception):
+      raise evaluation
+    if self.eval_cache is not None:
+      self.eval_cache.put(agent['genome'], evaluation)
+    agent['reward'], agent['bd'], agent['surprise'] = evaluation
+    return agent
+
+  def steady_state_step(self):
+    """
+    This function performs an epoch of steady-state NS. The workers are kept busy evaluating an offspring each, and every
+    evaluated offspring competes right away for a place in the population, while a new offspring is started in its slot.
+    There is no barrier between epochs: the offsprings being evaluated when the epoch ends are part of the next one.
+    At the end of the epoch the archive is updated with its offsprings, and everything is saved as for a generation.
+    :return: time taken for running the epoch
+    """
+    global main_pool
+    start_time = timer()
+
+    if np.any(self._needs_evaluation(self.population)): # Initial population
+      self.evaluate_in_env(self.population, pool=main_pool)
+      self.evolver.update_novelties(self.population)
+
+    self.offsprings = make_population(self.parameters, init_size=0, name='offsprings')
+    archive_size = self.evolver.archive.size
+    while self.offsprings.size < self.evolver.epoch_size:
+      while self.running < self._max_running():
+        self._start_evaluation(self.evolver.generate_agent(self.population), pool=main_pool)
+      agent = self._next_evaluated(pool=main_pool)
+      self.evolver.insert(self.population, agent)
+      self.offsprings.add(agent)
+
+    self.evolver.end_epoch(self.population, self.offsprings)
+    self.end_generation(archive_size)
     return timer() - start_time
+  # ---------------------------------
+
+  def save_generation(self, force=False):
+    """
+    This function saves population, archive and offsprings of the current generation, every save_every generations.
+    The snapshots are taken now, while the files are written in background by the checkpoint writer.
+    With the archive log, only the agents added to the archive since the last save are written.
+    :param force: If True, the generation is saved even if it is not a multiple of save_every
+    :return:
+    """
+    if self.saved_generations and self.saved_generations[-1] == self.generation:
+      return # Already saved
+    if not force and self.generation % self.parameters.save_every != 0:
+      return
+    filename = 'gen_{}'.format(self.generation)
+    # All the writes of the checkpoint are a single job, so the writer queue is bounded in checkpoints
+    writes = [(self.population.save, (self.parameters.save_path, filename, self.population.snapshot()))]
+    if self.parameters.archive_log:
+      writes.append((self.evolver.archive.log, (self.parameters.save_path, self.generation, self.evolver.archive.snapshot())))
+    else:
+      writes.append((self.evolver.archive.save, (self.parameters.save_path, filename, self.evolver.archive.snapshot())))
+    writes.append((self.offsprings.save, (self.parameters.save_path, filename, self.offsprings.snapshot())))
+    if self.coverage_records:
+      writes.append((self.save_coverage, (self.coverage_records,)))
+      self.coverage_records = []
+
+    self.saved_generations.append(self.generation)
+    if self.parameters.keep_last > 0 and len(self.saved_generations) > self.parameters.keep_last:
+      writes.append((self.remove_generation, (self.saved_generations.popleft(),)))
+    self.checkpoint_writer.submit_all(writes)
+
+  def save_coverage(self, records, mode='a'):
+    """
+    This function saves the coverage records in the coverage.jsonl file, a json line per generation
+    :param records: list of dicts with generation, archive_size, coverage and uniformity
+    :param mode: a to append to the file, w to overwrite it
+    :return:
+    """
+    with open(os.path.join(self.parameters.save_path, 'coverage.jsonl'), mode) as f:
+      for record in records:
+        f.write(json.dumps(record) + '\n')
+
+  def load_coverage(self, path):
+    """
+    This function loads the coverage records saved in the path
+    :param path: experiment path
+    :return: list of dicts with generation, archive_size, coverage and uniformity
+    """
+    if not os.path.exists(os.path.join(path, 'coverage.jsonl')):
+      return []
+    with open(os.path.join(path, 'coverage.jsonl')) as f:
+      return [json.loads(line) for line in f if line.strip()]
+
+  def remove_generation(self, generation):
+    """
+    This function removes the saved files of a generation. The archive log is not affected.
+    :param generation:
+    :return:
+    """
+    for name in ['population', 'offsprings', 'archive']:
+      for extension in ['npz', 'pkl']:
+        filepath = os.path.join(self.parameters.save_path, '{}_gen_{}.{}'.format(name, generation, extension))
+        if os.path.exists(filepath):
+          os.remove(filepath)
 
   def load_generation(self, generation, path):
     """
@@ -107,18 +407,52 @@ class Searcher(object):
     :param path: experiment path
     :return:
     """
+    self.checkpoint_writer.flush() # So the files being written can be loaded
     self.generation = generation
+    self.evolver.generation = generation
+    self.saved_generations = deque([generation])
+
+    self.population.load(self.generation_file(path, 'population', self.generation))
+    self.offsprings.load(self.generation_file(path, 'offsprings', self.generation))
+    if ArchiveLog.exists(os.path.join(path, 'archive_log')):
+      self.evolver.archive.load(os.path.join(path, 'archive_log'), generation=self.generation)
+    else:
+      self.evolver.archive.load(self.generation_file(path, 'archive', self.generation))
+    self.evolver.reset_archive_caches() # Calculated on the archive being replaced
+
+    if self.coverage_tracker is not None:
+      self.coverage_tracker.reset()
+      self.coverage_tracker.add(self.evolver.archive['bd'])
+      # The search continues from the generation, so the following ones are dropped
+      self.save_coverage([record for record in self.load_coverage(path) if record['generation'] <= generation], mode='w')
+      self.coverage_records = []
 
-    self.population.load(os.path.join(path, 'population_gen_{}.pkl'.format(self.generation)))
-    self.offsprings.load(os.path.join(path, 'offsprings_gen_{}.pkl'.format(self.generation)))
-    self.evolver.archive.load(os.path.join(path, 'archive_gen_{}.pkl'.format(self.generation)))
+  @staticmethod
+  def generation_file(path, name, generation):
+    """
+    Returns the file in which name is saved for the generation. The npz snapshot is preferred to the pkl file.
+    :param path: experiment path
+    :param name: population, offsprings or archive
+    :param generation:
+    :return:
+    """
+    filepath = os.path.join(path, '{}_gen_{}.npz'.format(name, generation))
+    if os.path.exists(filepath):
+      return filepath
+    return os.path.join(path, '{}_gen_{}.pkl'.format(name, generation))
 
   def close(self):
     """
-    This function closes the pool and deletes everything.
+    This function closes the pool and deletes everything. The pending saves are written before returning.
     :return:
     """
+    self.checkpoint_writer.close()
+    if self.parameters.distributed_address is not None:
+      self.distributed_evaluator.close()
     if self.parameters.multiprocesses:
       global main_pool
       main_pool.close()
       main_pool.join()
+      main_pool = None # So the searchers created later without multiprocesses do not use the closed pool
+      if self.parameters.shared_memory:
+        self.shared_buffers.release()
@@ -0,0 +1,126 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import numpy as np
+from multiprocessing import shared_memory
+
+# Arrays attached by this process, by name of the shared memory block. Used by the workers so each block is opened once
+attached = {}
+
+def attach(spec):
+  """
+  Returns the array backed by the shared memory block described by spec. The block is opened only the first time.
+  :param spec: (name, shape, dtype) of the block, as given by SharedArray.spec
+  :return: ndarray
+  """
+  name, shape, dtype = spec
+  if name not in attached:
+    shm = shared_memory.SharedMemory(name=name)
+    attached[name] = (shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf))
+  return attached[name][1]
+
+def detach(name):
+  """
+  Closes the shared memory block attached with the given name. The arrays returned by attach for it must not be used anymore.
+  :param name: Name of the block
+  :return:
+  """
+  shm, array = attached.pop(name)
+  del array # The buffer has to be released before closing the block
+  shm.close()
+
+def attach_specs(specs):
+  """
+  Returns the arrays described by the specs, closing the blocks attached before that are not among them.
+  When the buffers are reserved again they get new blocks, so this way the workers do not keep the old ones open.
+  :param specs: Dict of specs, as given by SharedEvaluationBuffers.specs
+  :return: Dict of ndarrays
+  """
+  names = set(spec[0] for spec in specs.values())
+  for name in [name for name in attached if name not in names]:
+    detach(name)
+  return {key: attach(specs[key]) for key in specs}
+
+
+class SharedArray(object):
+  """
+  This class implements an array backed by a shared memory block.
+  Other processes can access it through its spec, that only contains the name, shape and dtype of the block.
+  """
+  def __init__(self, shape, dtype=np.float64):
+    self.shape = tuple(shape)
+    self.dtype = np.dtype(dtype)
+    self.shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(self.shape)) * self.dtype.itemsize, 1))
+    self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+  @property
+  def spec(self):
+    """
+    Spec used to attach to the array from other processes
+    """
+    return self.shm.name, self.shape, self.dtype.str
+
+  def release(self):
+    """
+    Closes and frees the shared memory block
+    :return:
+    """
+    self.array = None
+    self.shm.close()
+    self.shm.unlink()
+
+
+class SharedEvaluationBuffers(object):
+  """
+  This class holds the shared arrays used to exchange genomes and evaluation results with the workers.
+  The genomes to evaluate are written in the genomes array, one per slot. The workers write reward, BD and surprise of
+  the genome in each slot in the corresponding output arrays. A surprise of None is stored as NaN.
+  """
+  def __init__(self, genome_size, bd_shape, capacity):
+    """
+    Constructor
+    :param genome_size:
+    :param bd_shape: Shape of the BD of a single agent
+    :param capacity: Initial number of slots
+    """
+    self.genome_size = genome_size
+    self.bd_shape = tuple(bd_shape)
+    self.capacity = 0
+    self.buffers = {}
+    self.reserve(capacity)
+
+  def reserve(self, capacity):
+    """
+    Makes sure there are at least capacity slots. If not, the arrays are allocated again with double the slots.
+    :param capacity:
+    :return:
+    """
+    if capacity <= self.capacity:
+      return
+    capacity = max(capacity, 2 * self.capacity)
+    self.release()
+    self.capacity = capacity
+    self.buffers = {'genome': SharedArray((self.capacity, self.genome_size)),
+                    'reward': SharedArray((self.capacity,)),
+                    'bd': SharedArray((self.capacity,) + self.bd_shape),
+                    'surprise': SharedArray((self.capacity,))}
+
+  def __getitem__(self, item):
+    return self.buffers[item].array
+
+  @property
+  def specs(self):
+    """
+    Specs of the arrays, to be sent to the workers
+    """
+    return {key: self.buffers[key].spec for key in self.buffers}
+
+  def release(self):
+    """
+    Frees the shared memory
+    :return:
+    """
+    for key in self.buffers:
+      self.buffers[key].release()
+    self.buffers = {}
+    self.capacity = 0
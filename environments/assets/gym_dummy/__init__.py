@@ -12,4 +12,19 @@ register(
 register(
     id='Walker2D-v0',
     entry_point='gym_dummy.envs:Walker2DEnv',
+)
+
+register(
+    id='DummyVec-v0',
+    entry_point='gym_dummy.envs:DummyVecEnv',
+)
+
+register(
+    id='RandomWalkVec-v0',
+    entry_point='gym_dummy.envs:RandomWalkVecEnv',
+)
+
+register(
+    id='Walker2DVec-v0',
+    entry_point='gym_dummy.envs:Walker2DVecEnv',
 )
\ No newline at end of file
@@ -2,4 +2,5 @@
 # Date: 13/03/2020
 
 from gym_dummy.envs.dummy_env import DummyEnv
-from gym_dummy.envs.walker_2d_env import Walker2DEnv
\ No newline at end of file
+from gym_dummy.envs.walker_2d_env import Walker2DEnv
+from gym_dummy.envs.vector_envs import DummyVecEnv, RandomWalkVecEnv, Walker2DVecEnv
\ No newline at end of file
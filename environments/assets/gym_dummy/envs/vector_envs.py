@@ -0,0 +1,126 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import gym
+from gym import spaces
+from gym.utils import seeding
+import numpy as np
+
+# These are the vectorized counterparts of the envs in this folder. Each of them holds the state of num_envs
+# environments and steps all of them with a single numpy operation.
+# The step returns the batch of observations (num_envs, 2), rewards (num_envs,), dones (num_envs,) and the infos as a
+# dict with an array of values per key, as gym vector envs do.
+# Environments whose episode is over are not updated anymore until the next reset.
+
+class DummyVecEnv(gym.Env):
+  """
+  Vectorized dummy environment. Used to test evolution algorithms. The observation corresponds to the action.
+  """
+  def __init__(self, num_envs=1, seed=None, max_steps=1):
+    """ Constructor
+    :param num_envs: number of environments
+    :param seed: the random seed for the environment
+    :param max_steps: the maximum number of steps the episode lasts
+    :return:
+    """
+    self.num_envs = num_envs
+    self.max_steps = max_steps
+    self.single_observation_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float32)
+    self.single_action_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float32)
+    self.observation_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float32)
+    self.action_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float32)
+    self.seed(seed)
+
+  def seed(self, seed=None):
+    """
+    Function to seed the environment
+    :param seed: The random seed
+    :return: [seed]
+    """
+    self.np_random, seed = seeding.np_random(seed)
+    return [seed]
+
+  def step(self, actions):
+    """
+    Performs environment step
+    :param actions: Batch of actions of shape (num_envs, 2)
+    :return:
+    """
+    return np.clip(actions, -1, 1), np.zeros(self.num_envs), np.ones(self.num_envs, dtype=bool), {}
+
+  def reset(self):
+    """
+    Resets environment
+    :return:
+    """
+    return np.zeros((self.num_envs, 2))
+
+
+class RandomWalkVecEnv(gym.Env):
+  """
+  Vectorized random walk environment. Used to test trajectory evolution algorithms. Each step is decided by the action given
+  """
+  def __init__(self, num_envs=1, seed=None, max_steps=100):
+    """ Constructor
+    :param num_envs: number of environments
+    :param seed: the random seed for the environment
+    :param max_steps: the maximum number of steps the episode lasts
+    :return:
+    """
+    self.num_envs = num_envs
+    self.max_steps = max_steps
+    self.single_observation_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float32)
+    self.single_action_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float32)
+    self.observation_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float32)
+    self.action_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float32)
+    self.seed(seed)
+    self.reset()
+
+  def seed(self, seed=None):
+    """
+    Function to seed the environment
+    :param seed: The random seed
+    :return: [seed]
+    """
+    self.np_random, seed = seeding.np_random(seed)
+    return [seed]
+
+  def step(self, actions):
+    """
+    Performs environment step. The actions are used to drive the "Random walks"
+    :param actions: Batch of actions of shape (num_envs, 2)
+    :return:
+    """
+    active = ~self.done
+    self.pose = np.where(active[:, None], np.clip(self.pose + 0.05 * actions, -1, 1), self.pose)
+    self.t = self.t + active
+    self.done = self.done | (self.t == self.max_steps)
+    return self.pose, np.zeros(self.num_envs), self.done.copy(), {}
+
+  def reset(self):
+    """
+    Resets environment
+    :return:
+    """
+    self.pose = np.zeros((self.num_envs, 2))
+    self.t = np.zeros(self.num_envs, dtype=int)
+    self.done = np.zeros(self.num_envs, dtype=bool)
+    return self.pose
+
+
+class Walker2DVecEnv(RandomWalkVecEnv):
+  """
+  Vectorized Walker2D environment. Same dynamics of the vectorized random walk, but with float64 spaces as Walker2DEnv
+  """
+  def __init__(self, num_envs=1, seed=None, max_steps=100):
+    """ Constructor
+    :param num_envs: number of environments
+    :param seed: the random seed for the environment
+    :param max_steps: the maximum number of steps the episode lasts
+    :return:
+    """
+    super(Walker2DVecEnv, self).__init__(num_envs=num_envs, seed=seed, max_steps=max_steps)
+    self.single_observation_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float64)
+    self.single_action_space = spaces.Box(low=-np.ones(2), high=np.ones(2), dtype=np.float64)
+    self.observation_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float64)
+    self.action_space = spaces.Box(low=-np.ones((num_envs, 2)), high=np.ones((num_envs, 2)), dtype=np.float64)
@@ -12,15 +12,18 @@ registered_envs = {}
 
 registered_envs['NAME'] = {
   'gym_name': None,
+  'vector_gym_name': None, # Vectorized version of the env, used by the BatchEvaluator. Optional
   'controller': None,
   'input_formatter': None,
   'output_formatter': None,
   "traj_to_obs": None,
+  'last_obs_bd': False, # True if the last element of traj_to_obs is the last raw observation, so the NS BD can be taken without recording the trajectory. Optional
 }
 
 
 registered_envs['Dummy'] = {
   'gym_name': 'Dummy-v0',
+  'vector_gym_name': 'DummyVec-v0',
   'controller': {
     'controller': DummyController,
     'input_formatter': dummy_input_formatter,
@@ -30,6 +33,7 @@ registered_envs['Dummy'] = {
     'name': 'dummy',
   },
   'traj_to_obs': dummy_obs,
+  'last_obs_bd': True,
   'max_steps': 1,
   'grid':{
     'min_coord':[-1,-1],
@@ -40,6 +44,7 @@ registered_envs['Dummy'] = {
 
 registered_envs['Walker2D'] = {
   'gym_name': 'Walker2D-v0',
+  'vector_gym_name': 'Walker2DVec-v0',
   'controller': {
     'controller': FFNeuralController,
     'input_formatter': walker_input_formatter,
@@ -49,6 +54,7 @@ registered_envs['Walker2D'] = {
     'name': 'dummy',
   },
   'traj_to_obs': walker_2D_obs,
+  'last_obs_bd': True,
   'max_steps': 50,
   'grid':{
     'min_coord':[-1,-1],
@@ -5,6 +5,7 @@ import os
 from datetime import datetime
 import json
 ROOT_DIR = os.path.dirname(os.path.abspath(__file__)) # This is your Project Root
+SECRET_PARAMS = ['distributed_authkey'] # Saved blanked, so the secrets are not in the experiment folder
 print('Root directory {}'.format(ROOT_DIR))
 
 class Params(object):
@@ -16,21 +17,47 @@ class Params(object):
     self.genome_limit = [-1, 1]
     self.pop_size = 50
     self.generations = 500
+    self.steady_state = False  # If True, offsprings are evaluated continuously and enter the population as soon as evaluated. A generation is then pop_size * offsprings_per_parent evaluations
 
     self.multiprocesses = 0
+    self.record_trajectories = False  # If True, BDs are extracted from the full recorded trajectories instead of step by step
+    self.eval_cache_size = 10000  # Max evaluations kept in cache. Used only with a fixed seed. If 0 every agent is evaluated at every generation
+    self.shared_memory = False  # If True, genomes and evaluation results are exchanged with the workers through shared memory
+    self.eval_batch_size = 0  # If > 0, the agents are evaluated in lockstep batches of this size
+    self.distributed_address = None  # host:port on which to wait for the evaluation workers (scripts/evaluation_worker.py). If None, the evaluation is local
+    self.distributed_authkey = ''  # Key the evaluation workers need to connect. Needed with distributed_address. It is not saved: give it with --authkey or the NS_AUTHKEY env var
+    self.distributed_heartbeat = 5.  # Seconds between heartbeats of the evaluation workers. Workers not heard for 3 heartbeats are considered lost
     self.novelty_neighs = 15
     self.mutation_parameters = {'mu': 0., 'sigma': 0.05}
+    self.mutation_operator = 'normal'  # Method of np.random.Generator used to sample the mutations
+    self.mutation_block_size = 10  # Number of parents whose offsprings are mutated with the same random stream
     self.offsprings_per_parent = 2
     self.selection_operator = 'random'  # random or best
     self.novelty_distance_metric = 'euclidean'
+    self.novelty_whitening = False  # If True, with the mahalanobis distance the BDs are whitened with the running covariance of the archive and compared with the euclidean distance. Until the archive has BD size + 1 agents, the euclidean distance is used. If False (default), at every generation the covariance of population, offsprings and archive is recalculated, as cdist does
+    self.novelty_whitening_refresh = 0.1  # The whitening is recalculated when the archive grows by this fraction
+    self.novelty_threads = 4  # Threads calculating the distances of blocks of agents from the other agents and, with the brute backend, the archive
+    self.novelty_neighbors_cache = True  # If True, the nearest archive distances of each agent are kept, so for surviving agents only the ones to the new archive agents are calculated
+    self.novelty_backend = 'kdtree'  # brute, kdtree or lsh. kdtree and lsh are used only with euclidean and manhattan distances, otherwise brute force is used. lsh is approximate: see scripts/knn_benchmark.py
+    self.novelty_lsh_tables = 16  # Hash tables of the lsh backend. More tables: better recall, slower queries
+    self.novelty_lsh_hashes = 6  # Projections per hash table of the lsh backend. More projections: faster queries, worse recall
     self._lambda = 5  # Number of agents added to archive
 
     self.archive_stored_info = ['genome', 'bd', 'id']
+    self.track_coverage = True  # If True, coverage and uniformity of the archive BDs on the env grid are saved at every generation
+    self.save_every = 1  # Generations between two saves. The saves are written in background
+    self.keep_last = 0  # Number of saved generations of population and offsprings that are kept. If 0 all are kept
+    self.snapshot_format = 'npz'  # npz: a typed array per key - pkl: pickled python objects
+    self.snapshot_compress = False  # If True, npz snapshots are compressed
+    self.snapshot_float32 = False  # If True, genomes and BDs are saved as float32 in npz snapshots
+    self.archive_log = True  # If True, only the agents added to the archive are appended to a log at every generation. Otherwise the whole archive is saved as a snapshot, in snapshot_format
+    self.population_layout = 'dict'  # dict: list of agents dicts - array: a single array for each agent key
 
     self.agent_template = {'genome': None,
                            'reward': None,
                            'bd': None,
                            'novelty': None,
+                           'surprise': None,
                            'parent': None,
                            'id': None
                           }
@@ -68,6 +95,8 @@ class Params(object):
   # --------------------------------------------
   def _get_dict(self):
     params_dict = {key:value for key, value in self.__dict__.items() if not key.startswith('__') and not callable(key)}
+    for key in SECRET_PARAMS:
+      params_dict[key] = ''
     return params_dict
 
   def save(self):
@@ -0,0 +1,70 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import re
+import argparse
+import pickle as pkl
+from parameters import Params
+from core.population.snapshot import to_columns, save_snapshot
+
+# This script converts the population, offsprings and archive pkl files saved in an experiment folder to npz snapshots.
+
+def convert_file(filepath, stored_info, compress=False, downcast=False, remove=False):
+  """
+  Converts a pkl file to an npz snapshot saved next to it
+  :param filepath: pkl file
+  :param stored_info: Infos stored in the archive. Needed for archives saved as lists of agents lists
+  :param compress: If True the snapshot is compressed
+  :param downcast: If True genomes and BDs are saved as float32
+  :param remove: If True the pkl file is removed after the conversion
+  :return: size of the pkl file and of the npz snapshot in bytes
+  """
+  with open(filepath, 'rb') as file:
+    data = pkl.load(file)
+  npz_path = filepath[:-len('.pkl')] + '.npz'
+  save_snapshot(npz_path, to_columns(data, keys=stored_info), compress=compress, downcast=downcast)
+  sizes = os.path.getsize(filepath), os.path.getsize(npz_path)
+  if remove:
+    os.remove(filepath)
+  return sizes
+
+def convert_folder(folder, compress=False, downcast=False, remove=False):
+  """
+  Converts all the *_gen_*.pkl files in the folder and in its subfolders
+  :param folder:
+  :param compress:
+  :param downcast:
+  :param remove:
+  :return:
+  """
+  r = re.compile('.*_gen_[0-9]+.pkl')
+  total_pkl, total_npz = 0, 0
+  for path, dirs, files in os.walk(folder):
+    files = [file for file in files if r.match(file) is not None]
+    if len(files) == 0:
+      continue
+    params = Params()
+    if os.path.exists(os.path.join(path, '_params.json')):
+      params.load(os.path.join(path, '_params.json'))
+    print('Converting {} files in {}'.format(len(files), path))
+    for file in files:
+      try:
+        pkl_size, npz_size = convert_file(os.path.join(path, file), params.archive_stored_info, compress, downcast, remove)
+        total_pkl += pkl_size
+        total_npz += npz_size
+      except Exception as e:
+        print('Cannot convert {}.'.format(file))
+        print('Exception {}'.format(e))
+  print('Done. Size of pkl files: {:.1f}MB - Size of npz snapshots: {:.1f}MB'.format(total_pkl / 1e6, total_npz / 1e6))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser('Convert pkl files of populations, offsprings and archives to npz snapshots')
+  parser.add_argument('-p', '--path', help='Path of the experiment, or of a folder containing experiments')
+  parser.add_argument('-c', '--compress', help='Compress the snapshots', action='store_true')
+  parser.add_argument('--float32', help='Save genomes and BDs as float32', action='store_true')
+  parser.add_argument('--remove', help='Remove the pkl files after the conversion', action='store_true')
+
+  args = parser.parse_args()
+  convert_folder(args.path, compress=args.compress, downcast=args.float32, remove=args.remove)
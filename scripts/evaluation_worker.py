@@ -0,0 +1,21 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import argparse
+from core.distributed import run_worker, AUTHKEY_ENV
+
+# This script runs an evaluation worker. It connects to the searcher started with distributed_address in the parameters
+# and evaluates the genomes it receives. Several workers can be launched on each machine.
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser('Run evaluation worker')
+  parser.add_argument('-a', '--address', help='Address of the searcher, as host:port', required=True)
+  parser.add_argument('-k', '--authkey', help='Key needed to connect to the searcher (distributed_authkey). If not given, it is read from the {} env var'.format(AUTHKEY_ENV),
+                      default=os.environ.get(AUTHKEY_ENV))
+  parser.add_argument('--once', help='Exit when the search is over, instead of waiting for the next one', action='store_true')
+
+  args = parser.parse_args()
+  if not args.authkey:
+    parser.error('the authkey is needed: give it with -k or the {} env var'.format(AUTHKEY_ENV))
+  run_worker(args.address, authkey=args.authkey, reconnect=not args.once)
@@ -0,0 +1,110 @@
+# Created by Giuseppe Paolo 
+# Date: 18/10/2026
+
+import os
+import argparse
+from timeit import default_timer as timer
+import numpy as np
+from scipy.stats import spearmanr
+from parameters import Params
+from core.evolvers import utils
+from core.evolvers.knn_index import LSHIndex
+
+# This script measures how much the novelty calculated with the approximate k-NN of the lsh backend differs from the
+# exact one. The BDs are split in a reference set, that is put in the index as an archive, and a set of query BDs.
+# The BDs are either the ones of the archive of an experiment or synthetic trajectories (random walks in 2D flattened
+# over the steps, like the BDs built from full trajectories).
+
+def synthetic_bds(size, steps, seed=0):
+  """
+  Generates BDs made by random walk trajectories
+  :param size: Number of BDs
+  :param steps: Steps of each trajectory. The BDs have 2 * steps dimensions
+  :param seed:
+  :return: Matrix of BDs
+  """
+  rng = np.random.default_rng(seed)
+  return np.cumsum(rng.normal(0, 1, size=(size, steps, 2)), axis=1).reshape(size, -1)
+
+def experiment_bds(path):
+  """
+  Loads the BDs of the archive of the last generation of the experiment
+  :param path: experiment path
+  :return: Matrix of BDs
+  """
+  from analysis.utils import load_arch_data # Imported here, so the synthetic benchmark does not need the analysis deps
+  params = Params()
+  params.load(os.path.join(path, '_params.json'))
+  archives = load_arch_data(path, info=['bd'], params=params)
+  return np.asarray(archives[max(archives)]['bd'], dtype=np.float64)
+
+def rank_error(exact, approx, top=5):
+  """
+  Compares the novelties calculated with the exact and the approximate k-NN
+  :param exact: exact novelties
+  :param approx: approximate novelties
+  :param top: Number of most novel agents to compare (e.g. the ones that would be added to the archive)
+  :return: dict with the errors
+  """
+  exact_rank = np.argsort(np.argsort(-exact))
+  approx_rank = np.argsort(np.argsort(-approx))
+  top_exact = set(np.argsort(-exact)[:top])
+  top_approx = set(np.argsort(-approx)[:top])
+  return {'novelty error': np.mean(np.abs(approx - exact) / np.maximum(exact, 1e-12)),
+          'rank error': np.mean(np.abs(exact_rank - approx_rank)) / len(exact),
+          'spearman': spearmanr(exact, approx)[0],
+          'top {} overlap'.format(top): len(top_exact & top_approx) / top}
+
+def benchmark(bds, queries, neighs=15, tables=(16,), hashes=(6,), distance_metric='euclidean', seed=0):
+  """
+  Calculates the novelty of the queries wrt the other BDs with the exact k-NN and with the lsh index, and prints the
+  errors and the times for each combination of tables and hashes
+  :param bds: Matrix of BDs
+  :param queries: Number of BDs used as queries
+  :param neighs: Number of neighbors used for the novelty
+  :param tables: Numbers of tables of the lsh index to try
+  :param hashes: Numbers of hashes per table of the lsh index to try
+  :param distance_metric:
+  :param seed:
+  :return:
+  """
+  rng = np.random.default_rng(seed)
+  idx = rng.permutation(len(bds))
+  query_set, reference_set = bds[idx[:queries]], bds[idx[queries:]]
+  print('Reference set: {} BDs of {} dimensions - Queries: {}'.format(len(reference_set), bds.shape[1], len(query_set)))
+
+  start = timer()
+  exact = utils.calculate_nearest_distances(query_set, reference_set, neighs, distance_metric=distance_metric).mean(axis=1)
+  print('Exact k-NN - Query time: {:.3f}s'.format(timer() - start))
+
+  for n_tables in tables:
+    for n_hashes in hashes:
+      index = LSHIndex(distance_metric=distance_metric, tables=n_tables, hashes=n_hashes, min_size=0, rng=np.random.default_rng(seed))
+      start = timer()
+      index.add(reference_set)
+      build_time = timer() - start
+      start = timer()
+      approx = index.query(query_set, neighs).mean(axis=1)
+      query_time = timer() - start
+      errors = ' - '.join('{}: {:.4f}'.format(key, value) for key, value in rank_error(exact, approx).items())
+      print('LSH tables {} hashes {} - Build time: {:.3f}s - Query time: {:.3f}s - {}'.format(n_tables, n_hashes, build_time, query_time, errors))
+
+
+if __name__ == "__main__":
+  parser = argparse.ArgumentParser('Compare the novelty calculated with the lsh backend with the exact one')
+  parser.add_argument('-p', '--path', help='Path of the experiment whose archive BDs are used. If not given, synthetic BDs are used')
+  parser.add_argument('-s', '--size', help='Number of synthetic BDs', type=int, default=100000)
+  parser.add_argument('--steps', help='Steps of the synthetic trajectories', type=int, default=50)
+  parser.add_argument('-q', '--queries', help='Number of BDs used as queries', type=int, default=300)
+  parser.add_argument('-k', '--neighs', help='Number of neighbors used for the novelty', type=int, default=15)
+  parser.add_argument('-t', '--tables', help='Numbers of tables to try', type=int, nargs='+', default=[16])
+  parser.add_argument('--hashes', help='Numbers of hashes per table to try', type=int, nargs='+', default=[6])
+  parser.add_argument('-d', '--distance', help='Distance metric', default='euclidean')
+
+  args = parser.parse_args()
+  if args.path is not None:
+    bds = experiment_bds(args.path)
+  else:
+    bds = synthetic_bds(args.size, args.steps)
+  benchmark(np.reshape(bds, (len(bds), -1)), args.queries, neighs=args.neighs, tables=args.tables, hashes=args.hashes,
+            distance_metric=args.distance)
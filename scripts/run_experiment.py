@@ -29,7 +29,9 @@ if __name__ == "__main__":
   parser.add_argument('-mp', '--multiprocesses', help='How many parallel workers need to use', type=int)
   parser.add_argument('-p', '--pop_size', help='Size of the population', type=int)
   parser.add_argument('-g', '--generations', help='Number of generations', type=int)
+  parser.add_argument('--steady_state', help='Run steady-state NS', action='store_true')
   parser.add_argument('-v', '--verbose', help='Verbose', action='store_true')
+  parser.add_argument('--authkey', help='Key of the distributed evaluation workers. It is not saved with the parameters')
   parser.add_argument('--restart_gen', help='Generation at which to restart. It will load from the savepath', type=int)
 
   args = parser.parse_args()
@@ -41,6 +43,8 @@ if __name__ == "__main__":
   if args.pop_size is not None: params.pop_size = args.pop_size
   if args.generations is not None: params.generations = args.generations
   if args.verbose is True: params.verbose = args.verbose
+  if args.steady_state is True: params.steady_state = args.steady_state
+  if args.authkey is not None: params.distributed_authkey = args.authkey
 
   print("SAVE PATH: {}".format(params.save_path))
   params.save()
@@ -59,17 +63,20 @@ if __name__ == "__main__":
     searcher.load_generation(args.restart_gen, args.save_path)
     print("\t Loading done.")
 
+  if params.steady_state:
+    step = searcher.steady_state_step
+  else:
+    step = searcher.generational_step
+
   gen_times = []
   for k in range(params.generations):
     if params.verbose: print("Generation: {}".format(k))
     bar.next()
     try:
-      gen_times.append(searcher.generational_step())
+      gen_times.append(step())
     except KeyboardInterrupt:
       print('User interruption. Saving.')
-      searcher.population.save(params.save_path, 'gen_{}'.format(searcher.generation))
-      searcher.offsprings.save(params.save_path, 'gen_{}'.format(searcher.generation))
-      searcher.evolver.archive.save(params.save_path, 'gen_{}'.format(searcher.generation))
+      searcher.save_generation(force=True)
       searcher.close()
       bar.finish()
       break
@@ -79,6 +86,9 @@ if __name__ == "__main__":
       searcher.close()
       bar.finish()
       sys.exit()
+  else:
+    searcher.save_generation(force=True)
+    searcher.close()
   print('Done.')
   total_time = np.sum(gen_times)
   print("Total time: {}".format(str(datetime.timedelta(seconds=total_time))))